@@ -0,0 +1,67 @@
+"""
+Compares two benchmark result files written by run.py and flags regressions.
+
+    python benchmarks/compare.py benchmarks/results/<before>.json benchmarks/results/<after>.json --threshold 0.1
+
+Exits with status 1 when any scenario got slower, placed less densely or used more memory
+than the threshold allows, or when the new results show any overlapping or doubly listed packages.
+"""
+import argparse
+import json
+import sys
+
+
+# Metric name -> True when a larger value is better
+METRICS = {
+    "throughput_per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "fill_ratio": True,
+    "peak_memory_mb": False,
+}
+
+# Counts of placement errors, which must be zero whatever the baseline had
+INVARIANTS = ("overlapping_pairs", "duplicate_listings")
+
+
+def load(path: str) -> dict:
+    with open(path, "r") as f:
+        report: dict = json.load(f)
+    return report, {(result["scenario"], result["distribution"], result["scale"]): result for result in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    before_report, before = load(args.before)
+    after_report, after = load(args.after)
+    print(f"{before_report['commit']} -> {after_report['commit']}")
+
+    regressions: int = 0
+    for key in sorted(set(before) & set(after)):
+        for metric, higher_is_better in METRICS.items():
+            if metric not in before[key] or metric not in after[key]:
+                continue
+            old, new = before[key][metric], after[key][metric]
+            change: float = (new - old) / old if old else 0.0
+            regressed: bool = change < -args.threshold if higher_is_better else change > args.threshold
+            regressions += regressed
+            print(f"{'REGRESSION ' if regressed else '           '}{'/'.join(map(str, key)):40} {metric:18} {old:12.3f} -> {new:12.3f} ({change:+.1%})")
+
+    for key in sorted(after):
+        for metric in INVARIANTS:
+            if after[key].get(metric):
+                regressions += 1
+                print(f"BROKEN     {'/'.join(map(str, key)):40} {metric:18} {after[key][metric]}")
+
+    for key in sorted(set(before) ^ set(after)):
+        print(f"{'/'.join(map(str, key))} only present in {'before' if key in before else 'after'}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import math
+import random
+
+
+CONTAINER_DIMENSIONS = (100, 60, 60)
+
+
+def uniform(count: int, rng: random.Random) -> list:
+    return [(rng.randint(5, 30), rng.randint(5, 30), rng.randint(5, 30)) for _ in range(count)]
+
+
+def heavy_tailed(count: int, rng: random.Random) -> list:
+    # Mostly small parcels with the occasional pallet-sized one
+    def side() -> int:
+        return min(55, int(4 * rng.paretovariate(1.5)))
+    return [(side(), side(), side()) for _ in range(count)]
+
+
+def identical_skus(count: int, rng: random.Random, skus: int = 5) -> list:
+    catalogue: list = uniform(skus, rng)
+    return [rng.choice(catalogue) for _ in range(count)]
+
+
+DISTRIBUTIONS = {
+    "uniform": uniform,
+    "heavy_tailed": heavy_tailed,
+    "identical_skus": identical_skus,
+}
+
+
+def manifest(distribution: str, count: int, seed: int = 0) -> list:
+    """
+    Returns `count` package dicts as accepted by /new_package/, drawn from the named distribution.
+    """
+    rng = random.Random(f"{distribution}-{count}-{seed}")
+    return [
+        {"id": f"P{index:07d}", "width": width, "length": length, "depth": depth}
+        for index, (width, length, depth) in enumerate(DISTRIBUTIONS[distribution](count, rng))
+    ]
+
+
+def fleet(packages: list, fill_target: float = 0.6) -> list:
+    """
+    Returns container dicts with enough total volume to hold the packages at `fill_target`.
+    """
+    width, length, depth = CONTAINER_DIMENSIONS
+    package_volume: int = sum(package["width"] * package["length"] * package["depth"] for package in packages)
+    count: int = math.ceil(package_volume / (width * length * depth * fill_target)) + 1
+    return [{"id": f"C{index:05d}", "width": width, "length": length, "depth": depth} for index in range(count)]
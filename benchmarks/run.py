@@ -0,0 +1,266 @@
+"""
+Placement benchmarks over synthetic container fleets and package manifests.
+
+    python benchmarks/run.py --scales 10,100,1000 --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/compare.py benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Every scenario runs against fresh stores in a temporary directory, never the app's own data files.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "load_manager"))
+
+from api.app import create_app
+from api.model.container import Container
+from api.model.package import Package
+from api.storage import open_store
+from placement.kernel import collisions
+from resources.package import load_package_to_container
+
+import manifests
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered: list = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    return {
+        "operations": len(latencies),
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else 0.0,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else 0.0,
+    }
+
+
+def use_storage(backend: str, directory: str):
+    for model, name, table in ((Container, "container.json", "containers"), (Package, "package.json", "packages")):
+        path: str = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write("{}")
+        if backend == "sqlite":
+            model.store = open_store(backend, os.path.join(directory, "load_manager.db"), table=table)
+        elif backend == "snapshot":
+            model.store = open_store(backend, f"{os.path.splitext(path)[0]}.snapshot", table=table)
+        else:
+            model.store = open_store(backend, path)
+    Container.placement_states.clear()
+
+
+def fill_ratio(containers: list) -> float:
+    used: list = [container for container in containers if container.packages]
+    if not used:
+        return 0.0
+    states: list = [container.placement_state() for container in used]
+    return sum(state.used_volume for state in states) / sum(state.volume for state in states)
+
+
+def bench_placement(packages: list, **_) -> dict:
+    """
+    Times load_package_to_container alone, filling in-memory containers one after another.
+    """
+    width, length, depth = manifests.CONTAINER_DIMENSIONS
+    containers: list = [Container("C00000", width, length, depth)]
+    latencies: list = []
+    started: float = time.perf_counter()
+    for item in packages:
+        package: Package = Package(item["id"], item["width"], item["length"], item["depth"])
+        for attempt in range(2):
+            begin: float = time.perf_counter()
+            loaded: bool = load_package_to_container(containers[-1], package)
+            latencies.append(time.perf_counter() - begin)
+            if loaded:
+                containers[-1].packages.append(package.id)
+                break
+            containers.append(Container(f"C{len(containers):05d}", width, length, depth))
+    result: dict = summarize(latencies, time.perf_counter() - started)
+    result.update({"containers": len(containers), "fill_ratio": fill_ratio(containers)})
+    return result
+
+
+def create_fleet(client, packages: list) -> list:
+    fleet: list = manifests.fleet(packages)
+    for container in fleet:
+        client.post("/new_container/", json=container)
+    return fleet
+
+
+def bench_request(packages: list, client, **_) -> dict:
+    """
+    Times the full /new_package/ request path into a fleet sized for the manifest.
+    """
+    create_fleet(client, packages)
+    latencies: list = []
+    failures: int = 0
+    started: float = time.perf_counter()
+    for item in packages:
+        begin: float = time.perf_counter()
+        response = client.post("/new_package/", json=item)
+        latencies.append(time.perf_counter() - begin)
+        failures += response.status_code != 201
+    result: dict = summarize(latencies, time.perf_counter() - started)
+    containers: list = Container.get_all()
+    result.update({
+        "unplaced": failures,
+        "containers": sum(1 for container in containers if container.packages),
+        "fill_ratio": fill_ratio(containers)
+    })
+    return result
+
+
+def bench_list(packages: list, client, **_) -> dict:
+    """
+    Loads the manifest through /packages/batch/, then times paging through /packages/ and a
+    full NDJSON export of it.
+    """
+    create_fleet(client, packages)
+    client.post("/packages/batch/", json={"packages": packages})
+
+    latencies: list = []
+    cursor: str = None
+    started: float = time.perf_counter()
+    while True:
+        begin: float = time.perf_counter()
+        response = client.get("/packages/", query_string={"limit": 500, **({"cursor": cursor} if cursor else {})})
+        latencies.append(time.perf_counter() - begin)
+        cursor = response.get_json().get("next_cursor")
+        if not cursor:
+            break
+    result: dict = summarize(latencies, time.perf_counter() - started)
+
+    begin: float = time.perf_counter()
+    response = client.get("/packages/", query_string={"format": "ndjson"}, buffered=False)
+    stream = iter(response.response)
+    first_chunk = next(stream, b"")
+    first_byte: float = time.perf_counter() - begin
+    lines: int = first_chunk.count(b"\n") + sum(chunk.count(b"\n") for chunk in stream)
+    result.update({
+        "export_records": lines,
+        "export_s": time.perf_counter() - begin,
+        "export_first_byte_ms": first_byte * 1000
+    })
+    return result
+
+
+def overlapping_pairs(containers: list) -> int:
+    overlaps: int = 0
+    for container in containers:
+        positions, dimensions = container.placement_state().boxes.view()
+        for row in range(len(positions)):
+            overlaps += int(collisions(positions[row + 1:], dimensions[row + 1:], positions[row], dimensions[row]).sum())
+    return overlaps
+
+
+def bench_concurrency(packages: list, client, app, threads: int = 8, **_) -> dict:
+    """
+    Fires /new_package/ requests from several threads at once and checks that no two of the
+    placed packages overlap.
+    """
+    create_fleet(client, packages)
+    latencies: list = []
+    lock = threading.Lock()
+
+    def worker(items: list):
+        worker_client = app.test_client()
+        for item in items:
+            begin: float = time.perf_counter()
+            worker_client.post("/new_package/", json=item)
+            with lock:
+                latencies.append(time.perf_counter() - begin)
+
+    workers: list = [threading.Thread(target=worker, args=(packages[index::threads],)) for index in range(threads)]
+    started: float = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    result: dict = summarize(latencies, time.perf_counter() - started)
+
+    Container.placement_states.clear()
+    containers: list = Container.get_all()
+    listed: list = [package_id for container in containers for package_id in container.packages]
+    result.update({
+        "threads": threads,
+        "placed": len(listed),
+        "duplicate_listings": len(listed) - len(set(listed)),
+        "overlapping_pairs": overlapping_pairs(containers)
+    })
+    return result
+
+
+SCENARIOS = {
+    "placement": bench_placement,
+    "request": bench_request,
+    "list": bench_list,
+    "concurrency": bench_concurrency,
+}
+
+
+def run_scenario(scenario: str, distribution: str, scale: int, backend: str, memory: bool, seed: int) -> dict:
+    packages: list = manifests.manifest(distribution, scale, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app("testing")
+        use_storage(backend, directory)
+        if memory:
+            tracemalloc.start()
+        result: dict = SCENARIOS[scenario](packages, client=app.test_client(), app=app)
+        if memory:
+            result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / (1 << 20)
+            tracemalloc.stop()
+    return {"scenario": scenario, "distribution": distribution, "scale": scale, **result}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10,100,1000", help="comma separated package counts, e.g. 10,100,1000,100000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--distributions", default=",".join(manifests.DISTRIBUTIONS))
+    parser.add_argument("--backend", default="json", choices=["json", "log", "snapshot", "sqlite"])
+    parser.add_argument("--memory", action="store_true", help="track peak Python memory (slows every scenario down)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write results to, for compare.py")
+    args = parser.parse_args()
+
+    report: dict = {
+        "commit": git_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "backend": args.backend,
+        "results": []
+    }
+    for scenario in args.scenarios.split(","):
+        for distribution in args.distributions.split(","):
+            for scale in (int(scale) for scale in args.scales.split(",")):
+                result: dict = run_scenario(scenario, distribution, scale, args.backend, args.memory, args.seed)
+                report["results"].append(result)
+                print(json.dumps(result), flush=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 #!/bin/sh
 export FLASK_APP=./load_manager/main.py
-export FLASK_DEBUG=1
-export FLASK_ENV=development
+export FLASK_ENV=${FLASK_ENV:-development}
 source $(pipenv --venv)/bin/activate
-flask run -h 0.0.0.0
\ No newline at end of file
+if [ "$FLASK_ENV" = "production" ]; then
+    cd load_manager && exec gunicorn --config gunicorn_conf.py wsgi:app
+fi
+export FLASK_DEBUG=1
+flask run -h 0.0.0.0
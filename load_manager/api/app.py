@@ -1,29 +1,103 @@
+import time
+
+# Taken before the framework imports below, so the startup report can include them
+IMPORT_STARTED: float = time.perf_counter()
+
+import json
+import os
+import sys
+from http import HTTPStatus
+
 from flask import Flask
 from flask_cors import CORS
 from flask_restful import Api
-from flasgger import Swagger
 from webargs.flaskparser import abort, parser
 from werkzeug import exceptions
 
 from api.config import env_config
-from resources.container import ContainerCreateResource, ContainerGetResource, ContainerListResource
+from api.docs import init_docs
+from api.model.container import Container
+from api.model.package import Package
+from api.model.repack_job import RepackJob
+from api.storage import open_store
+from api.storage import snapshot_store, sqlite_store
+from resources.container import (
+    ContainerBatchResource, ContainerCreateResource, ContainerGetResource, ContainerListResource, ContainerStatsResource,
+    FleetStatsResource
+)
 from resources.default import DefaultResource
-from resources.package import PackageCreateResource, PackageGetResource, PackageListResource
-from utils import errors
+from resources.metrics import MetricsResource
+from resources.package import (
+    PackageBatchResource, PackageCreateResource, PackageDeleteResource, PackageGetResource, PackageListResource
+)
+from resources.repack import RepackJobResource, RepackResource
+from utils import errors, metrics
 
 
 api = Api()
 
 
+def init_storage(config):
+    backend: str = config["STORAGE_BACKEND"]
+    for model, path, table in ((Container, Container.CONTAINER_JSON, "containers"), (Package, Package.PACKAGE_JSON, "packages")):
+        if backend == "sqlite":
+            if os.path.exists(path):
+                # First start on this backend carries the existing JSON records over
+                sqlite_store.import_json(path, config["SQLITE_PATH"], table)
+            model.store = open_store(backend, config["SQLITE_PATH"], table=table)
+        elif backend == "snapshot":
+            snapshot_path: str = f"{os.path.splitext(path)[0]}.snapshot"
+            if not os.path.exists(snapshot_path) and os.path.exists(path):
+                # First start on this backend carries the existing JSON records over
+                snapshot_store.import_json(path, snapshot_path, table)
+            model.store = open_store(backend, snapshot_path, table=table, compact_threshold=config["STORAGE_COMPACT_THRESHOLD"])
+        elif backend == "log":
+            model.store = open_store(backend, path, compact_threshold=config["STORAGE_COMPACT_THRESHOLD"])
+        else:
+            model.store = open_store(backend, path)
+    # Repack jobs are polled through any worker, so they are stored alongside; their results do
+    # not fit the typed snapshot tables, so that backend keeps them in a log instead
+    if backend == "sqlite":
+        RepackJob.store = open_store(backend, config["SQLITE_PATH"], table="repack_jobs")
+    elif backend in ("log", "snapshot"):
+        RepackJob.store = open_store("log", RepackJob.REPACK_JOB_JSON, compact_threshold=config["STORAGE_COMPACT_THRESHOLD"])
+    else:
+        RepackJob.store = open_store(backend, RepackJob.REPACK_JOB_JSON)
+
+
+IMPORT_SECONDS: float = time.perf_counter() - IMPORT_STARTED
+
+
+def warm_caches():
+    """
+    Loads every stored record and builds each container's placement state up front, so that
+    workers forked afterwards share them instead of each paying for it on first request.
+    """
+    Package.store.items()
+    for container in Container.get_all():
+        container.placement_state()
+
+
+def release_storage():
+    # Called in the parent before forking workers, which open their own connections
+    for model in (Container, Package, RepackJob):
+        model.store.close()
+
+
 def create_app(config_name):
     import resources
 
+    started: float = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(env_config[config_name])
     api.init_app(app)
+    init_storage(app.config)
+    Container.min_support = app.config["MIN_SUPPORT_RATIO"]
+    Container.balance_loads = app.config["PLACEMENT_BALANCE"]
+    metrics.init_app(app)
 
     CORS(app)
-    Swagger(app)
+    init_docs(app)
 
     app.register_error_handler(exceptions.NotFound, errors.handle_404_error)
     app.register_error_handler(exceptions.InternalServerError, errors.handle_500_error)
@@ -37,14 +111,31 @@ def create_app(config_name):
 
     @parser.error_handler
     def handle_request_parsing_error(err, req, schema, *, error_status_code, error_headers):
-        abort(error_status_code, errors=err.messages)
+        abort(error_status_code or HTTPStatus.UNPROCESSABLE_ENTITY, errors=err.messages)
+
+    timings: dict = {"imports": IMPORT_SECONDS, "create_app": time.perf_counter() - started}
+    if app.config["WARM_CACHE"]:
+        warm_started: float = time.perf_counter()
+        warm_caches()
+        timings["warm_cache"] = time.perf_counter() - warm_started
+    app.config["STARTUP_TIMINGS"] = timings
+    if app.config["STARTUP_REPORT"]:
+        print(json.dumps({"startup_seconds": timings}), file=sys.stderr, flush=True)
 
     return app
 
 api.add_resource(DefaultResource, "/", endpoint="home")
+api.add_resource(MetricsResource, "/metrics", endpoint="metrics")
 api.add_resource(ContainerCreateResource, "/new_container/", endpoint="create_container")
 api.add_resource(ContainerGetResource, "/get_container/<int:container_id>", endpoint="get_container")
 api.add_resource(ContainerListResource, "/containers/", endpoint="list_containers")
+api.add_resource(ContainerBatchResource, "/containers/batch/", endpoint="create_containers")
+api.add_resource(FleetStatsResource, "/containers/stats", endpoint="fleet_stats")
+api.add_resource(ContainerStatsResource, "/containers/stats/<string:container_id>", endpoint="container_stats")
+api.add_resource(RepackResource, "/containers/repack/", endpoint="repack_containers")
+api.add_resource(RepackJobResource, "/containers/repack/<string:job_id>", endpoint="repack_job")
 api.add_resource(PackageCreateResource, "/new_package/", endpoint="create_package")
+api.add_resource(PackageBatchResource, "/packages/batch/", endpoint="create_packages")
 api.add_resource(PackageGetResource, "/get_package/<int:package_id>", endpoint="get_package")
-api.add_resource(PackageListResource, "/packages/", endpoint="list_packages")
\ No newline at end of file
+api.add_resource(PackageListResource, "/packages/", endpoint="list_packages")
+api.add_resource(PackageDeleteResource, "/packages/<string:package_id>", endpoint="delete_package")
\ No newline at end of file
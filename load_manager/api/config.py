@@ -4,6 +4,32 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 
 class Config:
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+    STORAGE_COMPACT_THRESHOLD = int(os.getenv("STORAGE_COMPACT_THRESHOLD", 1000))
+    SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(basedir, "model", "load_manager.db"))
+    # Worker processes used to search candidate containers in parallel, 0 keeps the search in-process
+    PLACEMENT_WORKERS = int(os.getenv("PLACEMENT_WORKERS", 0))
+    # Below this many placed boxes across the candidates, a serial search beats shipping snapshots
+    PLACEMENT_PARALLEL_MIN_BOXES = int(os.getenv("PLACEMENT_PARALLEL_MIN_BOXES", 5000))
+    # Attempts at saving a placement into a container another worker process keeps changing
+    PLACEMENT_RETRIES = int(os.getenv("PLACEMENT_RETRIES", 3))
+    # Fraction of each package's base that must rest on the floor or packages below it, 0 disables the check
+    MIN_SUPPORT_RATIO = float(os.getenv("MIN_SUPPORT_RATIO", 0.0))
+    # Prefer, among equally low spots, the one keeping each container's centre of gravity central
+    PLACEMENT_BALANCE = os.getenv("PLACEMENT_BALANCE", "false").lower() == "true"
+    # Seconds a repack job may spend packing before it gives up, keeping the current layout
+    REPACK_TIME_LIMIT = float(os.getenv("REPACK_TIME_LIMIT", 10.0))
+    # Most recent repack jobs whose results are kept in the store to be polled
+    REPACK_JOBS_KEPT = int(os.getenv("REPACK_JOBS_KEPT", 100))
+    # Records fetched per store query when streaming list endpoints
+    LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", 500))
+    # Swagger docs at /apidocs/: "eager" builds them at startup, "lazy" on the first docs request, "off" disables them
+    DOCS = os.getenv("DOCS", "eager")
+    # Load all records and placement states at startup instead of on first use
+    WARM_CACHE = os.getenv("WARM_CACHE", "false").lower() == "true"
+    # Print how long imports, create_app and cache warm-up took to stderr at startup
+    STARTUP_REPORT = os.getenv("STARTUP_REPORT", "false").lower() == "true"
+
     @staticmethod
     def init_app(app):
         pass
@@ -18,7 +44,22 @@ class TestingConfig(Config):
 
 
 class ProductionConfig(Config):
-    pass
+    DEBUG = False
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "log")
+    DOCS = os.getenv("DOCS", "lazy")
+    WARM_CACHE = os.getenv("WARM_CACHE", "true").lower() == "true"
+
+    # Served by gunicorn through gunicorn_conf.py. Threaded workers let I/O-bound list and get
+    # requests overlap within a worker while placement stays CPU-bound per request.
+    BIND = os.getenv("BIND", "0.0.0.0:5000")
+    WORKERS = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+    WORKER_CLASS = os.getenv("WORKER_CLASS", "gthread")
+    THREADS = int(os.getenv("THREADS", 4))
+    KEEPALIVE = int(os.getenv("KEEPALIVE", 5))
+    TIMEOUT = int(os.getenv("TIMEOUT", 30))
+    MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", 0))
+    # Create the app, and warm its caches, once in the master so forked workers start ready
+    PRELOAD_APP = os.getenv("PRELOAD_APP", "true").lower() == "true"
 
 
 env_config = {
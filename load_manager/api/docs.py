@@ -0,0 +1,50 @@
+import threading
+
+from flask import Flask
+
+
+DOCS_PATHS = ("/apidocs", "/apispec", "/flasgger_static")
+
+
+class LazyDocs():
+    """
+    WSGI middleware serving the Swagger UI and spec from a separate docs app, which imports
+    flasgger and builds the spec from the main app's routes on the first docs request only.
+    """
+
+    def __init__(self, app: Flask):
+        self.app: Flask = app
+        self.wsgi_app = app.wsgi_app
+        self._docs: Flask = None
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO", "").startswith(DOCS_PATHS):
+            return self.docs()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+    def docs(self) -> Flask:
+        with self._lock:
+            if self._docs is None:
+                from flasgger import Swagger
+
+                docs = Flask(self.app.import_name)
+                docs.config.update(self.app.config)
+                for rule in self.app.url_map.iter_rules():
+                    if rule.endpoint != "static":
+                        docs.add_url_rule(rule.rule, rule.endpoint, self.app.view_functions[rule.endpoint], methods=rule.methods)
+                Swagger(docs)
+                self._docs = docs
+        return self._docs
+
+
+def init_docs(app: Flask):
+    mode: str = app.config["DOCS"]
+    if mode == "eager":
+        from flasgger import Swagger
+
+        Swagger(app)
+    elif mode == "lazy":
+        app.wsgi_app = LazyDocs(app)
+    elif mode != "off":
+        raise ValueError(f"Invalid DOCS mode {mode}, expected eager, lazy or off")
@@ -1,4 +1,6 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
+
+from .box_rotation_type import ROTATION_PERMUTATIONS, RotationConstraint, distinct_rotations
 
 
 class Box():
@@ -10,6 +12,8 @@ class Box():
     DWL = 4
     DLW = 5
 
+    __slots__ = ("width", "length", "depth", "rotation_orientation")
+
     def __init__(self, width: int, length: int, depth: int):
         self.width: int = width
         self.length: int = length
@@ -37,21 +41,22 @@ class Box():
             return ""
 
     def get_dimensions(self) -> tuple((int, int, int)):
-        if self.rotation_orientation == self.WLD:
-            return (self.width, self.length, self.depth)
-        elif self.rotation_orientation == self.WDL:
-            return (self.width, self.depth, self.length)
-        elif self.rotation_orientation == self.LWD:
-            return (self.length, self.width, self.depth)
-        elif self.rotation_orientation == self.LDW:
-            return (self.length, self.depth, self.width)
-        elif self.rotation_orientation == self.DLW:
-            return (self.depth, self.length, self.width)
-        elif self.rotation_orientation == self.DWL:
-            return (self.depth, self.width, self.length)
-        else:
+        return self.get_rotated_dimensions(self.rotation_orientation)
+
+    def get_rotated_dimensions(self, rotation_code: int) -> tuple((int, int, int)):
+        if not 0 <= rotation_code < len(ROTATION_PERMUTATIONS):
             # TODO: Raise exception due to invalid rotation code set
             return (0, 0, 0)
+        x, y, z = ROTATION_PERMUTATIONS[rotation_code]
+        dimensions = (self.width, self.length, self.depth)
+        return (dimensions[x], dimensions[y], dimensions[z])
+
+    def get_rotation_constraint(self) -> str:
+        return RotationConstraint.ANY
+
+    def get_orientations(self) -> list:
+        rotations: tuple = distinct_rotations(self.width, self.length, self.depth, self.get_rotation_constraint())
+        return [dimensions for _, dimensions in rotations]
 
     def print_dimensions(self) -> str:
         if self.rotation_orientation == self.WLD:
@@ -71,13 +76,14 @@ class Box():
             return ""
 
     def get_rotation_items(self):
-        return [self.WLD, self.WDL, self.LWD, self.LDW, self.DWL, self.DLW]
+        rotations: tuple = distinct_rotations(self.width, self.length, self.depth, self.get_rotation_constraint())
+        return [rotation_code for rotation_code, _ in rotations]
 
     def get_volume(self):
         return(self.width * self.length * self.depth)
 
 
 class BoxSchema(Schema):
-    width = fields.Int()
-    length = fields.Int()
-    depth = fields.Int()
\ No newline at end of file
+    width = fields.Int(required=True, validate=validate.Range(min=1))
+    length = fields.Int(required=True, validate=validate.Range(min=1))
+    depth = fields.Int(required=True, validate=validate.Range(min=1))
\ No newline at end of file
@@ -1,10 +1,57 @@
-from enum import Enum
+from enum import IntEnum
+from functools import lru_cache
 
 
-class BoxRotationType(Enum):
+class BoxRotationType(IntEnum):
     WLD = 0
     WDL = 1
     LWD = 2
     LDW = 3
     DWL = 4
-    DLW = 5
\ No newline at end of file
+    DLW = 5
+
+
+# Indexes into (width, length, depth) giving the box's extents along the container's
+# width, length and depth axes for each rotation code
+ROTATION_PERMUTATIONS = (
+    (0, 1, 2),
+    (0, 2, 1),
+    (1, 0, 2),
+    (1, 2, 0),
+    (2, 0, 1),
+    (2, 1, 0),
+)
+
+
+class RotationConstraint:
+    ANY = "any"
+    # The box's depth must stay on the container's depth axis, it may only turn about it
+    THIS_SIDE_UP = "this_side_up"
+    NONE = "none"
+
+    ALL = [ANY, THIS_SIDE_UP, NONE]
+
+
+ALLOWED_ROTATIONS = {
+    RotationConstraint.ANY: tuple(BoxRotationType),
+    RotationConstraint.THIS_SIDE_UP: (BoxRotationType.WLD, BoxRotationType.LWD),
+    RotationConstraint.NONE: (BoxRotationType.WLD,),
+}
+
+
+@lru_cache(maxsize=4096)
+def distinct_rotations(width: int, length: int, depth: int, constraint: str = RotationConstraint.ANY) -> tuple:
+    """
+    Returns ((rotation code, rotated dimensions), ...) for the rotations the constraint allows,
+    keeping only the first code for orientations that coincide because sides are equal.
+    """
+    dimensions = (width, length, depth)
+    rotations: list = []
+    seen: set = set()
+    for rotation_code in ALLOWED_ROTATIONS[constraint]:
+        x, y, z = ROTATION_PERMUTATIONS[rotation_code]
+        rotated = (dimensions[x], dimensions[y], dimensions[z])
+        if rotated not in seen:
+            seen.add(rotated)
+            rotations.append((int(rotation_code), rotated))
+    return tuple(rotations)
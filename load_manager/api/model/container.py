@@ -1,18 +1,70 @@
-import json
 import os
+import threading
 
-from marshmallow import fields, post_load
+from marshmallow import fields, post_load, validate
 
+from api.storage import ConflictError, JsonStore, Store, record_id
+from placement.state import ContainerState
+from utils import metrics
 from .box import Box, BoxSchema
+from .package import Package
+
+
+# Record fields Container.stats needs
+STATS_FIELDS = (
+    "width", "length", "depth", "version", "max_payload", "used_volume", "used_height", "payload", "package_count",
+    "free_box_bound", "balance_score"
+)
 
 
 class Container(Box):
     CONTAINER_JSON = os.path.join(os.path.dirname(os.path.realpath(__file__)), "container.json")
+    store: Store = JsonStore(CONTAINER_JSON)
+    # Placement states outlive the Container objects built per request, keyed by container id
+    placement_states: dict = {}
+    locks: dict = {}
+    # Fraction of a package's base that must rest on the floor or other packages, 0 allows overhangs
+    min_support: float = 0.0
+    # Whether placements favour keeping the load's centre of gravity in the middle of the floor
+    balance_loads: bool = False
+    _locks_lock = threading.Lock()
 
-    def __init__(self, id: str, width: int, length: int, depth: int, packages: list=[]):
+    __slots__ = (
+        "id", "packages", "version", "max_payload", "placements", "weights", "used_volume", "used_height", "payload",
+        "package_count", "free_box_bound", "balance_score", "layout", "points", "pruned_points", "_placement_state"
+    )
+
+    def __init__(self, id: str, width: int, length: int, depth: int, packages: list=None, version: int=None, max_payload: float=None,
+                 placements: list=None, weights: list=None, used_volume: int=0, used_height: int=0, payload: float=0.0,
+                 free_box_bound: list=None, balance_score: float=1.0, layout: int=0, package_count: int=None,
+                 points: list=None, pruned_points: int=0):
         super(Container, self).__init__(width, length, depth)
         self.id: str = id
-        self.packages: list = packages
+        self.packages: list = packages if packages is not None else []
+        # Incremented on every save; None until the container has been stored
+        self.version: int = version
+        # Total package weight the container can carry, None when unlimited
+        self.max_payload: float = max_payload
+        # Placed box of each package, in the order of `packages`, as [x, y, z, width, length, depth],
+        # and its weight, so the placement state is rebuilt without reading the packages
+        self.placements: list = placements if placements is not None else []
+        self.weights: list = weights if weights is not None else []
+        self.used_volume: int = used_volume
+        self.used_height: int = used_height
+        self.payload: float = payload
+        # Placement aggregates kept up to date on save; None for records saved before they were
+        self.package_count: int = package_count if package_count is not None else len(self.packages)
+        self.free_box_bound: list = free_box_bound if free_box_bound is not None or self.package_count else \
+            sorted((width, length, depth), reverse=True)
+        self.balance_score: float = balance_score
+        # Version at which the packages were last rewritten rather than appended to, None once
+        # they have been and the next save has yet to start the new layout
+        self.layout: int = layout
+        # Extreme points of the placement state saved with the placements, so it is restored
+        # rather than searched again box by box, and whether dominated ones were left out
+        self.points: list = points
+        self.pruned_points: int = pruned_points
+        self._placement_state: ContainerState = None
 
     def __str__(self):
         return f"Container [{self.id}]: {self.print_dimensions()} holding Packages {[package.id for package in self.packages]}"
@@ -23,51 +75,248 @@ class Container(Box):
             "length": self.length,
             "width": self.width,
             "depth": self.depth,
-            "packages": self.packages
+            "packages": self.packages,
+            "version": self.version,
+            "max_payload": self.max_payload,
+            "used_volume": self.used_volume,
+            "used_height": self.used_height,
+            "payload": self.payload
         }
 
     def publish_data(self) -> dict:
+        state: ContainerState = self._placement_state
+        if state is not None and len(state) == len(self.packages):
+            self.placements, self.weights = state.placements(self.packages)
+            self.points, self.pruned_points = state.point_rows(), int(state.prunes_points)
+            self._read_aggregates(state)
+        self.package_count = len(self.packages)
         return {
             "packages": self.packages,
             "length": self.length,
             "width": self.width,
-            "depth": self.depth
+            "depth": self.depth,
+            "version": self.version,
+            "max_payload": self.max_payload,
+            "placements": self.placements,
+            "weights": self.weights,
+            "used_volume": self.used_volume,
+            "used_height": self.used_height,
+            "payload": self.payload,
+            "package_count": self.package_count,
+            "free_box_bound": self.free_box_bound,
+            "balance_score": self.balance_score,
+            "layout": self.layout,
+            "points": self.points,
+            "pruned_points": self.pruned_points
         }
 
+    def stats(self) -> dict:
+        if self.free_box_bound is None:
+            self._read_aggregates(self.placement_state())
+        volume: int = self.get_volume()
+        return {
+            "id": self.id,
+            "package_count": self.package_count,
+            "volume": volume,
+            "used_volume": self.used_volume,
+            "free_volume": volume - self.used_volume,
+            "fill_ratio": self.used_volume / volume if volume else 0.0,
+            "free_box_bound": self.free_box_bound,
+            "used_height": self.used_height,
+            "payload": self.payload,
+            "max_payload": self.max_payload,
+            "balance_score": self.balance_score
+        }
+
+    def _read_aggregates(self, state: ContainerState):
+        self.used_volume, self.used_height, self.payload = state.used_volume, state.used_height, state.payload
+        self.free_box_bound = list(state.free_box_bound())
+        self.balance_score = state.balance_score()
+
+    @classmethod
+    def lock(cls, id: str) -> threading.RLock:
+        with cls._locks_lock:
+            return cls.locks.setdefault(id, threading.RLock())
+
+    def placement_state(self) -> ContainerState:
+        if self._placement_state is None:
+            # Held while a shared state is caught up, so no placement into it runs meanwhile
+            with self.lock(self.id):
+                state: ContainerState = self.placement_states.get(self.id)
+                if state is None or not self._catch_up(state):
+                    state = self._build_placement_state()
+                    self.placement_states[self.id] = state
+                self._placement_state = state
+        return self._placement_state
+
+    def new_placement_state(self) -> ContainerState:
+        return ContainerState(self.width, self.length, self.depth, self.min_support, self.max_payload, self.balance_loads)
+
+    def _build_placement_state(self) -> ContainerState:
+        state: ContainerState = self.new_placement_state()
+        # Points saved with dominated ones left out only serve a state leaving them out too
+        if self.points and len(self.placements) == len(self.packages) and (state.prunes_points or not self.pruned_points):
+            state.restore(self.packages, self.placements, self.weights, self.points)
+        elif len(self.placements) == len(self.packages):
+            for package_id, box, weight in zip(self.packages, self.placements, self.weights):
+                state.add(package_id, box[:3], box[3:], weight)
+        else:
+            # Records saved before containers kept their placements
+            for package_id in self.packages:
+                package: Package = Package.get_by_id(package_id)
+                if package:
+                    state.add(package.id, package.position, package.get_dimensions(), package.weight)
+        state.version, state.layout = self.version, self.layout
+        return state
+
+    def _catch_up(self, state: ContainerState) -> bool:
+        """
+        Brings a cached state up to date with this container, adding the packages saved since
+        (by this or another process) rather than rebuilding it. Returns False when the state
+        cannot be caught up: the settings changed or the packages were rewritten since, so its
+        boxes may not be the container's first. Packages that were only appended to keep their
+        layout, so that check does not compare the packages themselves.
+        """
+        if state.bounds != (self.width, self.length, self.depth) or \
+                (state.min_support, state.max_payload, state.balanced) != (self.min_support, self.max_payload, self.balance_loads):
+            return False
+        placed: int = len(state)
+        if state.version == self.version:
+            return placed == len(self.packages)
+        if state.version is None or self.version is None or state.version > self.version or \
+                state.layout != self.layout or placed > len(self.packages) or len(self.placements) != len(self.packages):
+            return False
+        for package_id, box, weight in zip(self.packages[placed:], self.placements[placed:], self.weights[placed:]):
+            state.add(package_id, box[:3], box[3:], weight)
+        state.version = self.version
+        return True
+
+    def unload(self, package_id: str):
+        # Takes the package out of the container and its placement state; nothing is saved here
+        state: ContainerState = self.placement_state()
+        self.packages.remove(package_id)
+        self.layout = None
+        if package_id in state.boxes.rows:
+            state.remove(package_id)
+
+    def use_placement_state(self, state: ContainerState):
+        # Replaces the container's placements with those of `state`, as when it has been repacked
+        self._placement_state = state
+        self.placement_states[self.id] = state
+        self.layout = None
+
+    def discard_placement_state(self):
+        # Drops a state holding placements that were never saved, so the next use rebuilds it
+        self._placement_state = None
+        self.placement_states.pop(self.id, None)
+
     def save(self):
-        with open(self.CONTAINER_JSON, "r") as f:
-            containers_dict: dict = json.load(f)
-        
-        containers_dict[self.id] = self.publish_data()
-        
-        with open(self.CONTAINER_JSON, "w") as f:
-            json.dump(containers_dict, f)
+        self.save_all([self])
+
+    @classmethod
+    @metrics.timed("container.save_all")
+    def save_all(cls, items: list):
+        """
+        Saves the containers in one write, provided none was changed by anyone else since it
+        was read; otherwise raises ConflictError and leaves every container unsaved.
+        """
+        records: dict = {}
+        for item in items:
+            record: dict = item.publish_data()
+            record["version"] = (item.version or 0) + 1
+            if item.layout is None:
+                record["layout"] = record["version"]
+            records[item.id] = record
+        try:
+            cls.store.put_many(records, {item.id: item.version for item in items})
+        except ConflictError:
+            for item in items:
+                item.discard_placement_state()
+            raise
+        for item in items:
+            item.version, item.layout = records[item.id]["version"], records[item.id]["layout"]
+            if item._placement_state is not None:
+                item._placement_state.version, item._placement_state.layout = item.version, item.layout
+
+    @classmethod
+    def from_record(cls, id: str, data: dict):
+        # Records written before containers were versioned count as version 0, and the bound
+        # saved as largest_free_box before it was renamed is recomputed when needed
+        data.pop("largest_free_box", None)
+        return cls(id, **{"version": 0, **data})
 
     @classmethod
+    @metrics.timed("container.get_all")
     def get_all(cls) -> list:
-        with open(cls.CONTAINER_JSON, "r") as f:
-            containers_dict: dict = json.load(f)
-        containers_list: list = []
-        for item in containers_dict.items():
-            data = item[1]
-            data["id"] = item[0]
-            containers_list.append(cls(**data))
-        return containers_list
+        return [cls.from_record(id, data) for id, data in cls.store.items()]
+
+    @classmethod
+    @metrics.timed("container.get_all_stats")
+    def get_all_stats(cls) -> list:
+        """
+        Returns the stats of every container, read from the aggregate fields of the stored
+        records alone, without their packages and placements. Records saved before they kept
+        the aggregates are read in full.
+        """
+        stats: list = []
+        for id, data in cls.store.select(STATS_FIELDS):
+            if data.get("package_count") is None:
+                container: Container = cls.get_by_id(id)
+                if container is not None:
+                    stats.append(container.stats())
+            else:
+                stats.append(cls.from_record(id, data).stats())
+        return stats
+
+    @classmethod
+    @metrics.timed("container.candidates")
+    def candidates(cls, orientations: list, weight: float = 0.0) -> list:
+        """
+        Returns the containers that may hold a box in one of the orientations, fullest first,
+        pruned on the aggregate fields of the stored records. They are read from those fields
+        alone, without their packages and placements, so each is read again in full with
+        get_by_id before anything is placed into it. Records saved before they kept the
+        aggregates are never pruned.
+        """
+        candidates: list = []
+        for id, data in cls.store.select(STATS_FIELDS):
+            container: Container = cls.from_record(id, data)
+            if data.get("package_count") is None or container.may_fit(orientations, weight):
+                candidates.append(container)
+        return sorted(candidates, key=lambda container: (container.get_volume() - container.used_volume, container.id))
+
+    def may_fit(self, orientations: list, weight: float = 0.0) -> bool:
+        # ContainerState.may_fit, read from the aggregates saved with the record
+        if self.max_payload is not None and self.payload + weight > self.max_payload:
+            return False
+        dimensions: list = sorted(orientations[0], reverse=True)
+        if dimensions[0] * dimensions[1] * dimensions[2] > self.get_volume() - self.used_volume:
+            return False
+        return self.free_box_bound is None or all(size <= free for size, free in zip(dimensions, self.free_box_bound))
+
+    @classmethod
+    @metrics.timed("container.query")
+    def query(cls, after: str = None, limit: int = None) -> list:
+        return [cls.from_record(id, data) for id, data in cls.store.query(after=after, limit=limit)]
 
     @classmethod
+    @metrics.timed("container.get_by_id")
     def get_by_id(cls, id: str):
-        with open(cls.CONTAINER_JSON, "r") as f:
-            containers_dict: dict = json.load(f)
-        if not containers_dict.get(id):
+        id = record_id(id)
+        data: dict = cls.store.get(id)
+        if not data:
             return None
-        return cls(id, **containers_dict[id])
+        return cls.from_record(id, data)
 
 
 class ContainerSchema(BoxSchema):
-    id = fields.Str()
+    id = fields.Str(required=True)
     packages = fields.List(fields.Str())
+    max_payload = fields.Float(allow_none=True, validate=validate.Range(min=0))
     active = fields.Bool()
 
     @post_load
-    def make_container(self, data):
+    def make_container(self, data, **kwargs):
+        # Accepted for compatibility with older clients, but containers do not keep it
+        data.pop("active", None)
         return Container(**data)
@@ -1,21 +1,27 @@
-import json
 import os
 
-from marshmallow import fields, post_load
+from marshmallow import fields, post_load, validate
 
+from api.storage import JsonStore, Store, record_id
+from utils import metrics
 from .box import Box, BoxSchema
-from .box_rotation_type import BoxRotationType
+from .box_rotation_type import BoxRotationType, RotationConstraint
 
 
 class Package(Box):
     PACKAGE_JSON = os.path.join(os.path.dirname(os.path.realpath(__file__)), "package.json")
+    store: Store = JsonStore(PACKAGE_JSON)
 
-    def __init__(self, id: str, width: int, length: int, depth: int, container_id: str=None, position: tuple((int, int, int))=(0, 0, 0), rotation_orientation: int = BoxRotationType.WLD):
+    __slots__ = ("id", "container_id", "position", "rotation_constraint", "weight")
+
+    def __init__(self, id: str, width: int, length: int, depth: int, container_id: str=None, position: tuple((int, int, int))=(0, 0, 0), rotation_orientation: int = BoxRotationType.WLD, rotation_constraint: str = RotationConstraint.ANY, weight: float = 0.0):
         super(Package, self).__init__(width, length, depth)
         self.id: str = id
         self.container_id: str = container_id
-        self.rotation_orientation: int = rotation_orientation
-        self.position: list = position
+        self.rotation_orientation: int = int(rotation_orientation)
+        self.position: tuple = tuple(position)
+        self.rotation_constraint: str = rotation_constraint
+        self.weight: float = weight
 
     def __str__(self):
         return f"Package [{self.id}]: Oriented {self.print_dimensions()} in Container {self.container_id} at position {self.position}"
@@ -25,58 +31,81 @@ class Package(Box):
             "id": self.id,
             "container_id": self.container_id,
             "rotation_orientation": self.rotation_orientation,
-            "position": self.position,
+            "rotation_constraint": self.rotation_constraint,
+            "position": list(self.position),
             "length": self.length,
             "width": self.width,
-            "depth": self.depth
+            "depth": self.depth,
+            "weight": self.weight
         }
 
     def publish_data(self) -> dict:
         return {
             "container_id": self.container_id,
             "rotation_orientation": self.rotation_orientation,
-            "position": self.position,
+            "rotation_constraint": self.rotation_constraint,
+            "position": list(self.position),
             "length": self.length,
             "width": self.width,
-            "depth": self.depth
+            "depth": self.depth,
+            "weight": self.weight
         }
 
-    def save(self):
-        with open(self.PACKAGE_JSON, "r") as f:
-            packages_dict: dict = json.load(f)
+    def get_rotation_constraint(self) -> str:
+        return self.rotation_constraint
+
+    def save(self, new: bool=False):
+        self.save_all([self], new)
+
+    @classmethod
+    @metrics.timed("package.save_all")
+    def save_all(cls, items: list, new: bool=False, existing: bool=False):
+        # New packages must not exist yet, which guards against concurrent creates of the same ID,
+        # and existing ones must still exist, so one deleted meanwhile is not written back.
+        # Package records are unversioned, which the store reads as version 0.
+        expected: dict = None
+        if new:
+            expected = {item.id: None for item in items}
+        elif existing:
+            expected = {item.id: 0 for item in items}
+        cls.store.put_many({item.id: item.publish_data() for item in items}, expected)
+
+    def delete(self):
+        self.delete_all([self.id])
 
-        packages_dict[self.id] = self.publish_data()
-        
-        with open(self.PACKAGE_JSON, "w") as f:
-            json.dump(packages_dict, f)
+    @classmethod
+    @metrics.timed("package.delete_all")
+    def delete_all(cls, ids: list):
+        cls.store.delete_many(ids)
 
     @classmethod
+    @metrics.timed("package.get_all")
     def get_all(cls) -> list:
-        with open(cls.PACKAGE_JSON, "r") as f:
-            packages_dict: dict = json.load(f)
-            print(packages_dict)
-        packages_list: list = []
-        for item in packages_dict.items():
-            data = item[1]
-            data["id"] = item[0]
-            packages_list.append(cls(**data))
-        return packages_list
+        return [cls(id, **data) for id, data in cls.store.items()]
+
+    @classmethod
+    @metrics.timed("package.query")
+    def query(cls, container_id: str = None, after: str = None, limit: int = None) -> list:
+        return [cls(id, **data) for id, data in cls.store.query(container_id=container_id, after=after, limit=limit)]
 
     @classmethod
+    @metrics.timed("package.get_by_id")
     def get_by_id(cls, id: str):
-        with open(cls.PACKAGE_JSON, "r") as f:
-            packages_dict: dict = json.load(f)
-        if not packages_dict.get(id):
+        id = record_id(id)
+        data: dict = cls.store.get(id)
+        if not data:
             return None
-        return cls(id, **packages_dict[id])
+        return cls(id, **data)
 
 
 class PackageSchema(BoxSchema):
     id = fields.Str()
     container_id = fields.Str()
     rotation_orientation = fields.Int()
+    rotation_constraint = fields.Str(validate=validate.OneOf(RotationConstraint.ALL))
     position = fields.List(fields.Int())
+    weight = fields.Float(validate=validate.Range(min=0))
 
     @post_load
-    def make_package(self, data):
+    def make_package(self, data, **kwargs):
         return Package(**data)
\ No newline at end of file
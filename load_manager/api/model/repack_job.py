@@ -0,0 +1,68 @@
+import os
+import time
+import uuid
+
+from api.storage import JsonStore, Store, record_id
+from utils import metrics
+
+
+class RepackJob():
+    """
+    A background repack and its result, stored like the other records so that whichever
+    worker process is asked about the job can answer, not only the one running it.
+    """
+    REPACK_JOB_JSON = os.path.join(os.path.dirname(os.path.realpath(__file__)), "repack_job.json")
+    store: Store = JsonStore(REPACK_JOB_JSON)
+
+    __slots__ = ("id", "container_ids", "time_limit", "state", "result", "created")
+
+    def __init__(self, id: str = None, container_ids: list = None, time_limit: float = None, state: str = "running",
+                 result: dict = None, created: float = None):
+        self.id: str = id or uuid.uuid4().hex
+        self.container_ids: list = container_ids
+        self.time_limit: float = time_limit
+        # running, finished or failed; a job whose process died while running stays running
+        self.state: str = state
+        self.result: dict = result
+        self.created: float = created if created is not None else time.time()
+
+    def data(self) -> dict:
+        return {
+            "id": self.id,
+            "container_ids": self.container_ids,
+            "time_limit": self.time_limit,
+            "state": self.state,
+            "result": self.result
+        }
+
+    def publish_data(self) -> dict:
+        return {
+            "container_ids": self.container_ids,
+            "time_limit": self.time_limit,
+            "state": self.state,
+            "result": self.result,
+            "created": self.created
+        }
+
+    @metrics.timed("repack_job.save")
+    def save(self, existing: bool = False):
+        # Existing jobs must still exist, so one dropped while it ran is not written back; job
+        # records are unversioned, which the store reads as version 0
+        self.store.put_many({self.id: self.publish_data()}, {self.id: 0} if existing else None)
+
+    @classmethod
+    @metrics.timed("repack_job.prune")
+    def prune(cls, kept: int):
+        # Drops the oldest jobs past the `kept` most recent ones
+        created: list = sorted(cls.store.select(("created",)), key=lambda item: item[1].get("created", 0))
+        if len(created) > kept:
+            cls.store.delete_many([id for id, _ in created[:len(created) - kept]])
+
+    @classmethod
+    @metrics.timed("repack_job.get_by_id")
+    def get_by_id(cls, id: str):
+        id = record_id(id)
+        data: dict = cls.store.get(id)
+        if not data:
+            return None
+        return cls(id, **data)
@@ -0,0 +1,17 @@
+from .base import ConflictError, Store, record_id
+from .json_store import JsonStore
+from .log_store import LogStore
+from .snapshot_store import SnapshotStore
+from .sqlite_store import SqliteStore
+
+
+def open_store(backend: str, path: str, **options) -> Store:
+    if backend == "json":
+        return JsonStore(path)
+    elif backend == "log":
+        return LogStore(path, **options)
+    elif backend == "snapshot":
+        return SnapshotStore(path, **options)
+    elif backend == "sqlite":
+        return SqliteStore(path, **options)
+    raise ValueError(f"Unknown storage backend {backend}")
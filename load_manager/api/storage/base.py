@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+
+
+class ConflictError(Exception):
+    pass
+
+
+def record_id(id) -> str:
+    # Route converters may pass ids as ints, while records are keyed by string
+    return str(id)
+
+
+def check_versions(records: dict, expected_versions: dict):
+    """
+    Raises ConflictError unless each id in `expected_versions` has a stored record at that
+    version, or no stored record at all when the expected version is None.
+    """
+    for id, expected in (expected_versions or {}).items():
+        record: dict = records.get(id)
+        actual = None if record is None else record.get("version", 0)
+        if actual != expected:
+            raise ConflictError(f"Record {id} is at version {actual}, expected {expected}")
+
+
+class Store(ABC):
+    """
+    Interface the models use to persist records, which are plain dicts keyed by string id.
+    Records handed out are copies of the stored dict and of the lists and dicts in it, so callers
+    may set fields and add or remove items freely. Values nested a level further, such as the
+    boxes in a container's placements, may be shared with the store and are replaced rather
+    than changed in place, which keeps handing out thousands of boxes cheap.
+    """
+
+    def __contains__(self, id: str) -> bool:
+        return self.get(id) is not None
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, id: str) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def items(self) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(self, container_id: str = None, after: str = None, limit: int = None) -> list:
+        """
+        Returns (id, record) pairs ordered by id, optionally only those whose record has the
+        given container_id and whose id sorts after `after`, at most `limit` of them.
+        """
+        raise NotImplementedError
+
+    def keys(self) -> list:
+        # Ids of every record, in order, without handing out the records
+        return [id for id, _ in self.query()]
+
+    def select(self, fields: tuple) -> list:
+        """
+        Returns (id, record) pairs ordered by id with only the given fields of each record, those
+        set to None left out. Backends that can read fields on their own override this to skip
+        decoding the rest.
+        """
+        return [(id, {field: record[field] for field in fields if record.get(field) is not None}) for id, record in self.query()]
+
+    def put(self, id: str, record: dict):
+        self.put_many({id: record})
+
+    @abstractmethod
+    def put_many(self, records: dict, expected_versions: dict = None):
+        """
+        Writes all records, or none of them if any id in `expected_versions` is not currently
+        stored at the given version (None meaning it must not exist yet), raising ConflictError.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_many(self, ids: list):
+        raise NotImplementedError
+
+    def reload(self):
+        pass
+
+    def close(self):
+        """
+        Releases handles that must not be shared with a forked child, such as open connections.
+        """
+        pass
@@ -0,0 +1,129 @@
+import bisect
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from .base import Store, check_versions
+
+
+@contextmanager
+def file_lock(path: str):
+    # Serializes writers across processes; the flock is released when the file is closed
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def copy_value(value):
+    # One level deep: lists nested in the copy, such as placement boxes, are still shared
+    return dict(value) if isinstance(value, dict) else list(value)
+
+
+def copy_record(record: dict) -> dict:
+    return {key: copy_value(value) if isinstance(value, (dict, list, tuple)) else value for key, value in record.items()}
+
+
+def copy_fields(record: dict, fields: tuple) -> dict:
+    return {field: copy_value(record[field]) if isinstance(record[field], (dict, list, tuple)) else record[field]
+            for field in fields if record.get(field) is not None}
+
+
+class JsonStore(Store):
+    """
+    Process-wide view of a JSON file of records keyed by id. The file is parsed once and
+    re-read only when its inode, size or modification time changes, so lookups are plain dict
+    access. Writers re-read it once they hold the file lock whatever its stat says.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.lock_path: str = f"{path}.lock"
+        self._records: dict = None
+        self._signature: tuple = None
+        self._sorted_ids: list = None
+        self._lock = threading.RLock()
+
+    def _stat(self) -> tuple:
+        # Two writes within one mtime tick still differ in inode, as each is an os.replace
+        stat: os.stat_result = os.stat(self.path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load(self, reload: bool = False) -> dict:
+        signature: tuple = self._stat()
+        if reload or self._records is None or signature != self._signature:
+            with self._lock:
+                if reload or self._records is None or signature != self._signature:
+                    with open(self.path, "r") as f:
+                        self._records = json.load(f)
+                    self._signature = signature
+                    self._sorted_ids = None
+        return self._records
+
+    def _flush(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._records, f)
+        os.replace(tmp_path, self.path)
+        self._signature = self._stat()
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._load()
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def get(self, id: str) -> dict:
+        record = self._load().get(id)
+        return copy_record(record) if record is not None else None
+
+    def items(self) -> list:
+        return [(id, copy_record(record)) for id, record in self._load().items()]
+
+    def keys(self) -> list:
+        return sorted(self._load())
+
+    def select(self, fields: tuple) -> list:
+        return sorted(((id, copy_fields(record, fields)) for id, record in self._load().items()), key=lambda item: item[0])
+
+    def query(self, container_id: str = None, after: str = None, limit: int = None) -> list:
+        with self._lock:
+            records: dict = self._load()
+            if self._sorted_ids is None:
+                self._sorted_ids = sorted(records)
+            sorted_ids: list = self._sorted_ids
+            page: list = []
+            start: int = bisect.bisect_right(sorted_ids, after) if after is not None else 0
+            for index in range(start, len(sorted_ids)):
+                if limit is not None and len(page) >= limit:
+                    break
+                id: str = sorted_ids[index]
+                record: dict = records.get(id)
+                if record is not None and (container_id is None or record.get("container_id") == container_id):
+                    page.append((id, copy_record(record)))
+            return page
+
+    def put_many(self, records: dict, expected_versions: dict = None):
+        if not records:
+            return
+        with self._lock, file_lock(self.lock_path):
+            stored: dict = self._load(reload=True)
+            check_versions(stored, expected_versions)
+            for id, record in records.items():
+                stored[id] = copy_record(record)
+            self._sorted_ids = None
+            self._flush()
+
+    def delete_many(self, ids: list):
+        with self._lock, file_lock(self.lock_path):
+            stored: dict = self._load(reload=True)
+            for id in ids:
+                stored.pop(id, None)
+            self._sorted_ids = None
+            self._flush()
+
+    def reload(self):
+        with self._lock:
+            self._records = None
+            self._signature = None
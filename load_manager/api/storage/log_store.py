@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+
+from .base import check_versions
+from .json_store import JsonStore, copy_record, file_lock
+
+
+class LogStore(JsonStore):
+    """
+    Write-ahead log on top of a JSON snapshot. Each put appends one record to `<path>.log`,
+    startup replays snapshot + log, and once the log grows past `compact_threshold` records
+    it is folded back into the snapshot on a background thread.
+    """
+
+    def __init__(self, path: str, compact_threshold: int = 1000, fsync: bool = True):
+        super(LogStore, self).__init__(path)
+        self.log_path: str = f"{path}.log"
+        self.old_log_path: str = f"{path}.log.old"
+        self.compact_lock_path: str = f"{path}.compact.lock"
+        self.compact_threshold: int = compact_threshold
+        self.fsync: bool = fsync
+        self._log_inode: int = None
+        self._log_offset: int = 0
+        self._log_records: int = 0
+        self._compacting: bool = False
+        self._torn_tail: bool = False
+
+    def _read_snapshot(self) -> dict:
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _write_snapshot(self, path: str, records: dict):
+        with open(path, "w") as f:
+            json.dump(records, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _stat_log(self) -> os.stat_result:
+        try:
+            return os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+
+    def _replay(self, path: str, offset: int = 0) -> int:
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn write from a crash mid-append; everything before it is intact
+                        self._torn_tail = True
+                        break
+                    entry: dict = json.loads(line)
+                    if entry.get("deleted"):
+                        self._records.pop(entry["id"], None)
+                    else:
+                        self._records[entry["id"]] = entry["record"]
+                    self._log_records += 1
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+        return offset
+
+    def _load(self) -> dict:
+        signature: tuple = self._stat()
+        log_stat = self._stat_log()
+        log_inode = log_stat.st_ino if log_stat else None
+        log_size = log_stat.st_size if log_stat else 0
+        if self._records is not None and signature == self._signature and log_inode == self._log_inode \
+                and log_size == self._log_offset:
+            return self._records
+
+        with self._lock:
+            if self._records is None or signature != self._signature or log_inode != self._log_inode:
+                self._records = self._read_snapshot()
+                self._signature = signature
+                self._log_records = 0
+                self._replay(self.old_log_path)
+                self._log_inode = log_inode
+                self._log_offset = 0
+                self._sorted_ids = None
+            log_offset: int = self._replay(self.log_path, self._log_offset)
+            if log_offset != self._log_offset:
+                self._sorted_ids = None
+            self._log_offset = log_offset
+        return self._records
+
+    def put_many(self, records: dict, expected_versions: dict = None):
+        if records:
+            self._append([{"id": id, "record": copy_record(record)} for id, record in records.items()], expected_versions)
+
+    def delete_many(self, ids: list):
+        if ids:
+            self._append([{"id": id, "deleted": True} for id in ids])
+
+    def _append(self, entries: list, expected_versions: dict = None):
+        with self._lock, file_lock(self.lock_path):
+            check_versions(self._load(), expected_versions)
+            lines = b"".join(json.dumps(entry).encode() + b"\n" for entry in entries)
+            with open(self.log_path, "ab") as f:
+                if self._torn_tail:
+                    f.truncate(self._log_offset)
+                    self._torn_tail = False
+                f.write(lines)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            # The appended lines are picked up by the next _load like any other writer's,
+            # which keeps the replay offset correct when several processes share the log.
+            self._load()
+            if self._log_records >= self.compact_threshold and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        try:
+            with file_lock(self.compact_lock_path):
+                with self._lock, file_lock(self.lock_path):
+                    if os.path.exists(self.log_path) and not os.path.exists(self.old_log_path):
+                        os.rename(self.log_path, self.old_log_path)
+                    records: dict = dict(self._load().items())
+                tmp_path = f"{self.path}.tmp"
+                self._write_snapshot(tmp_path, records)
+                with self._lock, file_lock(self.lock_path):
+                    os.replace(tmp_path, self.path)
+                    if os.path.exists(self.old_log_path):
+                        os.remove(self.old_log_path)
+                    self._records = None
+                    self._load()
+        finally:
+            self._compacting = False
@@ -0,0 +1,328 @@
+import json
+import math
+import os
+import struct
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .json_store import copy_fields, file_lock
+from .log_store import LogStore
+
+
+MAGIC = b"LMSNAP01"
+ALIGNMENT = 64
+# Stands in for a missing integer field, which is left out again when the record is read
+INT_NULL = np.iinfo(np.int64).min
+
+# Column kinds holding a list per record; boxes are [x, y, z, width, length, depth] rows
+LIST_KINDS = ("strings", "boxes", "floats")
+
+# Column kind of each record field, per table. Missing or None fields are stored as a null
+# value (INT_NULL, NaN or an empty string) and left out of the record when it is read back.
+# List kinds are stored as the concatenated items plus each row's offset into them.
+TABLES = {
+    "containers": {
+        "width": "int",
+        "length": "int",
+        "depth": "int",
+        "version": "int",
+        "max_payload": "float",
+        "packages": "strings",
+        "placements": "boxes",
+        "weights": "floats",
+        "used_volume": "int",
+        "used_height": "int",
+        "payload": "float",
+        "package_count": "int",
+        "free_box_bound": "int3",
+        "balance_score": "float",
+        "layout": "int",
+        "points": "boxes",
+        "pruned_points": "int"
+    },
+    "packages": {
+        "container_id": "string",
+        "width": "int",
+        "length": "int",
+        "depth": "int",
+        "position": "int3",
+        "rotation_orientation": "int",
+        "rotation_constraint": "string",
+        "weight": "float"
+    },
+}
+
+
+def bytes_array(values: list) -> np.ndarray:
+    return np.array(values, dtype=f"S{max([len(value) for value in values] + [1])}")
+
+
+def encode_columns(table: str, records: dict) -> dict:
+    ids: list = sorted(records)
+    rows: list = [records[id] for id in ids]
+    columns: dict = {"id": bytes_array([id.encode() for id in ids])}
+    for field, kind in TABLES[table].items():
+        values: list = [row.get(field) for row in rows]
+        if kind == "int":
+            columns[field] = np.array([INT_NULL if value is None else value for value in values], dtype=np.int64)
+        elif kind == "float":
+            columns[field] = np.array([math.nan if value is None else value for value in values], dtype=np.float64)
+        elif kind == "int3":
+            columns[field] = np.array([(INT_NULL,) * 3 if value is None else value for value in values], dtype=np.int64).reshape(-1, 3)
+        elif kind == "string":
+            columns[field] = bytes_array([(value or "").encode() for value in values])
+        else:
+            lists: list = [value or [] for value in values]
+            items: list = [item for value in lists for item in value]
+            columns[f"{field}.offsets"] = np.cumsum([0] + [len(value) for value in lists], dtype=np.int64)
+            if kind == "strings":
+                columns[f"{field}.values"] = bytes_array([item.encode() for item in items])
+            elif kind == "boxes":
+                columns[f"{field}.values"] = np.array(items, dtype=np.int64).reshape(-1, 6)
+            else:
+                columns[f"{field}.values"] = np.array(items, dtype=np.float64)
+    return columns
+
+
+def list_items(kind: str, values: np.ndarray) -> list:
+    items: list = values.tolist()
+    return [item.decode() for item in items] if kind == "strings" else items
+
+
+def write_snapshot(path: str, table: str, records: dict):
+    """
+    Writes records in the columnar snapshot layout: the magic bytes, the length of a JSON
+    header describing each column's dtype, shape and offset, then every column as a raw,
+    64 byte aligned array, ready to be memory mapped.
+    """
+    columns: dict = encode_columns(table, records)
+    layout: dict = {}
+    offset: int = 0
+    for name, array in columns.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header: bytes = json.dumps({"table": table, "rows": len(records), "columns": layout}).encode()
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        f.write(b"\0" * (-f.tell() % ALIGNMENT))
+        for array in columns.values():
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % ALIGNMENT))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def decode(kind: str, value):
+    if kind == "int":
+        return None if value == INT_NULL else value
+    if kind == "float":
+        return None if math.isnan(value) else value
+    if kind == "int3":
+        return None if value[0] == INT_NULL else value
+    return value.decode() or None
+
+
+def null_mask(kind: str, column: np.ndarray) -> np.ndarray:
+    if kind == "int":
+        return column == INT_NULL
+    if kind == "float":
+        return np.isnan(column)
+    if kind == "int3":
+        return column[:, 0] == INT_NULL
+    return column == b""
+
+
+class Snapshot():
+    """
+    Read-only, memory mapped view of a snapshot file. Opening one only parses the header;
+    records are decoded from the shared pages as they are accessed.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a snapshot file")
+            header_length, = struct.unpack("<Q", f.read(8))
+            header: dict = json.loads(f.read(header_length))
+        start: int = len(MAGIC) + 8 + header_length
+        start += -start % ALIGNMENT
+        self.table: str = header["table"]
+        self.rows: int = header["rows"]
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        self.columns: dict = {
+            name: np.ndarray(tuple(column["shape"]), dtype=np.dtype(column["dtype"]), buffer=buffer, offset=start + column["offset"])
+            for name, column in header["columns"].items()
+        }
+        self._ids: list = None
+
+    def ids(self) -> list:
+        if self._ids is None:
+            self._ids = [id.decode() for id in self.columns["id"].tolist()]
+        return self._ids
+
+    def fields(self) -> list:
+        # Fields added to the table since the file was written are left out of its records
+        return [
+            (field, kind) for field, kind in TABLES[self.table].items()
+            if (f"{field}.offsets" if kind in LIST_KINDS else field) in self.columns
+        ]
+
+    def index(self, id: str) -> int:
+        key: bytes = str(id).encode()
+        ids: np.ndarray = self.columns["id"]
+        if len(key) > ids.dtype.itemsize:
+            return None
+        index: int = int(np.searchsorted(ids, key))
+        return index if index < len(ids) and ids[index] == key else None
+
+    def row(self, index: int) -> dict:
+        record: dict = {}
+        for field, kind in self.fields():
+            if kind in LIST_KINDS:
+                start, end = self.columns[f"{field}.offsets"][index:index + 2].tolist()
+                record[field] = list_items(kind, self.columns[f"{field}.values"][start:end])
+            else:
+                value = decode(kind, self.columns[field][index].tolist())
+                if value is not None:
+                    record[field] = value
+        return record
+
+    def records(self, only: tuple = None):
+        """
+        Yields every (id, record) pair, decoding column by column rather than row by row, and
+        only the columns of the fields in `only` when given.
+        """
+        fields: list = []
+        columns: list = []
+        nullable: list = []
+        for field, kind in self.fields():
+            if only is not None and field not in only:
+                continue
+            if kind in LIST_KINDS:
+                offsets: list = self.columns[f"{field}.offsets"].tolist()
+                items: list = list_items(kind, self.columns[f"{field}.values"])
+                values: list = [items[start:end] for start, end in zip(offsets, offsets[1:])]
+            else:
+                column: np.ndarray = self.columns[field]
+                values: list = column.tolist()
+                if kind == "string":
+                    values = [value.decode() for value in values]
+                nulls: np.ndarray = null_mask(kind, column)
+                if nulls.any():
+                    values = [None if null else value for value, null in zip(values, nulls.tolist())]
+                    nullable.append(field)
+            fields.append(field)
+            columns.append(values)
+        for id, row in zip(self.ids(), zip(*columns)):
+            record: dict = dict(zip(fields, row))
+            for field in nullable:
+                if record[field] is None:
+                    del record[field]
+            yield id, record
+
+
+class SnapshotRecords(MutableMapping):
+    """
+    The records of a Snapshot with the changes made since layered on top, None marking an id
+    deleted since. This is what a SnapshotStore replays its log into.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot: Snapshot = snapshot
+        self.overlay: dict = {}
+
+    def __getitem__(self, id: str) -> dict:
+        if id in self.overlay:
+            record: dict = self.overlay[id]
+            if record is None:
+                raise KeyError(id)
+            return record
+        index: int = self.snapshot.index(id)
+        if index is None:
+            raise KeyError(id)
+        return self.snapshot.row(index)
+
+    def __contains__(self, id: str) -> bool:
+        if id in self.overlay:
+            return self.overlay[id] is not None
+        return self.snapshot.index(id) is not None
+
+    def __setitem__(self, id: str, record: dict):
+        self.overlay[id] = record
+
+    def __delitem__(self, id: str):
+        if id not in self:
+            raise KeyError(id)
+        self.overlay[id] = None
+
+    def __iter__(self):
+        for id in self.snapshot.ids():
+            if id not in self.overlay:
+                yield id
+        for id, record in self.overlay.items():
+            if record is not None:
+                yield id
+
+    def __len__(self) -> int:
+        length: int = self.snapshot.rows
+        for id, record in self.overlay.items():
+            stored: bool = self.snapshot.index(id) is not None
+            length += (record is not None) - stored
+        return length
+
+    def items(self, only: tuple = None) -> list:
+        items: list = [(id, record) for id, record in self.snapshot.records(only) if id not in self.overlay]
+        items.extend((id, record) for id, record in self.overlay.items() if record is not None)
+        return items
+
+
+class SnapshotStore(LogStore):
+    """
+    LogStore whose snapshot is a memory mapped columnar file instead of JSON, so a large
+    inventory opens without being parsed and worker processes share its pages read-only.
+    Records are looked up by binary search over the sorted id column; the log of changes
+    since the last compaction is kept as an overlay in memory.
+    """
+
+    def __init__(self, path: str, table: str, compact_threshold: int = 1000, fsync: bool = True):
+        if table not in TABLES:
+            raise ValueError(f"Invalid snapshot table {table}, expected one of {', '.join(TABLES)}")
+        super(SnapshotStore, self).__init__(path, compact_threshold, fsync)
+        self.table: str = table
+        if not os.path.exists(path):
+            with file_lock(self.lock_path):
+                if not os.path.exists(path):
+                    self._write_snapshot(f"{path}.tmp", {})
+                    os.replace(f"{path}.tmp", path)
+
+    def select(self, fields: tuple) -> list:
+        items: list = self._load().items(fields)
+        return sorted(((id, copy_fields(record, fields)) for id, record in items), key=lambda item: item[0])
+
+    def _read_snapshot(self) -> SnapshotRecords:
+        return SnapshotRecords(Snapshot(self.path))
+
+    def _write_snapshot(self, path: str, records: dict):
+        write_snapshot(path, self.table, records)
+
+
+def import_json(json_path: str, path: str, table: str):
+    """
+    Converts a JSON file of records keyed by id into a snapshot, replacing any at `path`.
+    """
+    with open(json_path, "r") as f:
+        records: dict = json.load(f)
+    write_snapshot(f"{path}.tmp", table, records)
+    os.replace(f"{path}.tmp", path)
+
+
+def export_json(path: str, json_path: str):
+    """
+    Writes the current records of a snapshot store, logged changes included, as a JSON file
+    of records keyed by id.
+    """
+    store: SnapshotStore = SnapshotStore(path, Snapshot(path).table)
+    with open(f"{json_path}.tmp", "w") as f:
+        json.dump(dict(store.items()), f)
+    os.replace(f"{json_path}.tmp", json_path)
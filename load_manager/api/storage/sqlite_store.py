@@ -0,0 +1,133 @@
+import json
+import sqlite3
+import threading
+
+from .base import Store, check_versions
+
+
+def create_table(connection: sqlite3.Connection, table: str):
+    connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, container_id TEXT, data TEXT NOT NULL)")
+    connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_container_id ON {table} (container_id, id)")
+
+
+def insert_records(connection: sqlite3.Connection, table: str, records: dict):
+    connection.executemany(
+        f"INSERT OR REPLACE INTO {table} (id, container_id, data) VALUES (?, ?, ?)",
+        [(id, record.get("container_id"), json.dumps(record)) for id, record in records.items()]
+    )
+
+
+class SqliteStore(Store):
+    """
+    Records kept in one table of a SQLite database in WAL mode, with the record's container_id
+    pulled out into an indexed column so per-container and paged queries never scan the table.
+    Each thread gets its own connection; sqlite3 caches the prepared statements per connection.
+    """
+
+    def __init__(self, path: str, table: str):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name {table}")
+        self.path: str = path
+        self.table: str = table
+        self._local = threading.local()
+        with self._connection() as connection:
+            create_table(connection, table)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: sqlite3.Connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection: sqlite3.Connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def __len__(self) -> int:
+        return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def __contains__(self, id: str) -> bool:
+        return self._connection().execute(f"SELECT 1 FROM {self.table} WHERE id = ?", (id,)).fetchone() is not None
+
+    def get(self, id: str) -> dict:
+        row = self._connection().execute(f"SELECT data FROM {self.table} WHERE id = ?", (id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def items(self) -> list:
+        return self.query()
+
+    def keys(self) -> list:
+        return [id for id, in self._connection().execute(f"SELECT id FROM {self.table} ORDER BY id")]
+
+    def query(self, container_id: str = None, after: str = None, limit: int = None) -> list:
+        clauses: list = []
+        parameters: list = []
+        if container_id is not None:
+            clauses.append("container_id = ?")
+            parameters.append(container_id)
+        if after is not None:
+            clauses.append("id > ?")
+            parameters.append(after)
+        where: str = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        parameters.append(-1 if limit is None else limit)
+        rows = self._connection().execute(
+            f"SELECT id, data FROM {self.table} {where} ORDER BY id LIMIT ?", parameters
+        )
+        return [(id, json.loads(data)) for id, data in rows]
+
+    def select(self, fields: tuple) -> list:
+        # Scalars come back as SQL values; lists and objects as JSON text, told apart by their type
+        columns: str = ", ".join("json_extract(data, ?), json_type(data, ?)" for _ in fields)
+        parameters: list = [f"$.{field}" for field in fields for _ in range(2)]
+        rows = self._connection().execute(f"SELECT id, {columns} FROM {self.table} ORDER BY id", parameters)
+        selected: list = []
+        for id, *values in rows:
+            record: dict = {}
+            for field, value, kind in zip(fields, values[::2], values[1::2]):
+                if value is not None:
+                    record[field] = json.loads(value) if kind in ("array", "object") else value
+            selected.append((id, record))
+        return selected
+
+    def put_many(self, records: dict, expected_versions: dict = None):
+        if not records:
+            return
+        with self._connection() as connection:
+            if expected_versions:
+                # Take the write lock before reading so the version check and the write are atomic
+                connection.execute("BEGIN IMMEDIATE")
+                placeholders: str = ", ".join("?" for _ in expected_versions)
+                rows = connection.execute(
+                    f"SELECT id, data FROM {self.table} WHERE id IN ({placeholders})", list(expected_versions)
+                )
+                check_versions({id: json.loads(data) for id, data in rows}, expected_versions)
+            insert_records(connection, self.table, records)
+
+    def delete_many(self, ids: list):
+        with self._connection() as connection:
+            connection.executemany(f"DELETE FROM {self.table} WHERE id = ?", [(id,) for id in ids])
+
+
+def import_json(json_path: str, path: str, table: str):
+    """
+    Creates the table from a JSON file of records keyed by id, unless the database already has
+    that table, so the records are carried over once and later changes are never overwritten.
+    """
+    connection: sqlite3.Connection = sqlite3.connect(path, timeout=30)
+    try:
+        with connection:
+            # Holds the write lock from the check to the import, so concurrent starts import once
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                return
+            with open(json_path, "r") as f:
+                records: dict = json.load(f)
+            create_table(connection, table)
+            insert_records(connection, table, records)
+    finally:
+        connection.close()
@@ -0,0 +1,37 @@
+"""
+Converts between the JSON record files and the binary snapshots of the snapshot storage backend.
+
+    python load_manager/convert_snapshot.py import containers api/model/container.json api/model/container.snapshot
+    python load_manager/convert_snapshot.py export api/model/container.snapshot container.json
+
+Exporting includes the changes logged since the snapshot was last compacted.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.storage.snapshot_store import TABLES, export_json, import_json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="write a snapshot from a JSON record file")
+    import_parser.add_argument("table", choices=list(TABLES))
+    import_parser.add_argument("json_path")
+    import_parser.add_argument("snapshot_path")
+    export_parser = commands.add_parser("export", help="write a JSON record file from a snapshot")
+    export_parser.add_argument("snapshot_path")
+    export_parser.add_argument("json_path")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_json(args.json_path, args.snapshot_path, args.table)
+    else:
+        export_json(args.snapshot_path, args.json_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.config import ProductionConfig
+
+
+bind = ProductionConfig.BIND
+workers = ProductionConfig.WORKERS
+worker_class = ProductionConfig.WORKER_CLASS
+threads = ProductionConfig.THREADS
+keepalive = ProductionConfig.KEEPALIVE
+timeout = ProductionConfig.TIMEOUT
+max_requests = ProductionConfig.MAX_REQUESTS
+preload_app = ProductionConfig.PRELOAD_APP
+accesslog = "-"
+
+
+def pre_fork(server, worker):
+    from api.app import release_storage
+
+    release_storage()
@@ -0,0 +1,47 @@
+"""
+Imports a fleet of containers, given as a JSON array or one JSON object per line, in a single
+storage write and prints one result per container as a JSON line.
+
+    python load_manager/import_fleet.py fleet.json
+    cat fleet.ndjson | python load_manager/import_fleet.py - --env production
+
+Exits with status 1 when any container was not created.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.app import create_app
+from resources.container import import_containers
+
+
+def read_fleet(path: str) -> list:
+    if path == "-":
+        text: str = sys.stdin.read()
+    else:
+        with open(path, "r") as f:
+            text: str = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="fleet file, or - to read it from stdin")
+    parser.add_argument("--env", default=os.getenv("FLASK_ENV", "development"), help="configuration to load storage settings from")
+    args = parser.parse_args()
+
+    app = create_app(args.env)
+    with app.app_context():
+        results: list = import_containers(read_fleet(args.path))
+    for result in results:
+        print(json.dumps(result))
+    sys.exit(0 if all(result["status"] == "created" for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import os
+import sys
+
+# Imports are relative to this directory, wherever the app is started from
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from api.app import create_app
 
 
-app = create_app(os.getenv("FLASK_ENV"))
\ No newline at end of file
+app = create_app(os.getenv("FLASK_ENV"))
@@ -0,0 +1,46 @@
+class SpatialGrid():
+    """
+    Uniform grid over a container's interior. Each placed box is registered in every cell it
+    overlaps, so a collision query only looks at boxes sharing cells with the candidate.
+    """
+
+    def __init__(self, width: int, length: int, depth: int, cells_per_axis: int = 8):
+        self.bounds: tuple = (width, length, depth)
+        self.cell_size: tuple = tuple(max(1, -(-size // cells_per_axis)) for size in self.bounds)
+        self.cells: dict = {}
+        self.boxes: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def _cells(self, position, dimensions):
+        ranges = [
+            range(position[axis] // self.cell_size[axis], (position[axis] + dimensions[axis] - 1) // self.cell_size[axis] + 1)
+            for axis in range(3)
+        ]
+        for i in ranges[0]:
+            for j in ranges[1]:
+                for k in ranges[2]:
+                    yield (i, j, k)
+
+    def insert(self, key, position, dimensions):
+        if key in self.boxes:
+            self.remove(key)
+        position, dimensions = tuple(position), tuple(dimensions)
+        self.boxes[key] = (position, dimensions)
+        for cell in self._cells(position, dimensions):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        position, dimensions = self.boxes.pop(key)
+        for cell in self._cells(position, dimensions):
+            keys: set = self.cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self.cells[cell]
+
+    def nearby(self, position, dimensions) -> set:
+        candidates: set = set()
+        for cell in self._cells(position, dimensions):
+            candidates.update(self.cells.get(cell, ()))
+        return candidates
@@ -0,0 +1,148 @@
+from functools import partial
+
+import numpy as np
+
+from utils import metrics
+
+
+# Upper bound on pivots x boxes compared in one broadcast, keeping the temporary boolean
+# arrays to a few megabytes regardless of container size.
+MAX_CHUNK_CELLS = 1 << 21
+
+# Candidate points in the first chunk a search checks before doubling it
+FIRST_CHUNK = 8
+
+
+class BoxArray():
+    """
+    Placed boxes stored as parallel (N, 3) integer arrays of positions and dimensions,
+    grown geometrically so appends are amortized O(1).
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.positions: np.ndarray = np.zeros((capacity, 3), dtype=np.int64)
+        self.dimensions: np.ndarray = np.zeros((capacity, 3), dtype=np.int64)
+        self.keys: list = []
+        self.rows: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def append(self, key, position, dimensions):
+        row = len(self.keys)
+        if row == len(self.positions):
+            self.positions = np.concatenate([self.positions, np.zeros_like(self.positions)])
+            self.dimensions = np.concatenate([self.dimensions, np.zeros_like(self.dimensions)])
+        self.positions[row] = position
+        self.dimensions[row] = dimensions
+        self.keys.append(key)
+        self.rows[key] = row
+
+    def remove(self, key):
+        row = self.rows.pop(key)
+        last = len(self.keys) - 1
+        if row != last:
+            self.positions[row] = self.positions[last]
+            self.dimensions[row] = self.dimensions[last]
+            self.keys[row] = self.keys[last]
+            self.rows[self.keys[row]] = row
+        self.keys.pop()
+
+    def view(self, rows=None) -> tuple:
+        positions, dimensions = self.positions[:len(self.keys)], self.dimensions[:len(self.keys)]
+        if rows is not None:
+            return positions[rows], dimensions[rows]
+        return positions, dimensions
+
+
+def collisions(positions: np.ndarray, dimensions: np.ndarray, position, box_dimensions) -> np.ndarray:
+    position = np.asarray(position, dtype=np.int64)
+    end = position + np.asarray(box_dimensions, dtype=np.int64)
+    return np.all((positions < end) & (position < positions + dimensions), axis=1)
+
+
+def overlapping(positions: np.ndarray, dimensions: np.ndarray, low, high) -> np.ndarray:
+    # Rows of the boxes overlapping the region from `low` up to, but excluding, `high`
+    return np.flatnonzero(np.all((positions < np.asarray(high)) & (np.asarray(low) < positions + dimensions), axis=1))
+
+
+@metrics.timed("feasible_placements")
+def feasible_placements(bounds, positions: np.ndarray, dimensions: np.ndarray, pivots, orientations) -> np.ndarray:
+    """
+    Returns a (P, R) mask of which orientations fit at which pivots: inside `bounds` and not
+    overlapping any of the N boxes described by `positions`/`dimensions`. Boxes are first
+    paired with the pivots whose reach they overlap, so only those pairs are checked per orientation.
+    """
+    pivots = np.asarray(pivots, dtype=np.int64).reshape(-1, 3)
+    orientations = np.asarray(orientations, dtype=np.int64).reshape(-1, 3)
+    ends = pivots[:, None, :] + orientations[None, :, :]
+    mask = np.all(ends <= np.asarray(bounds, dtype=np.int64), axis=2) & np.all(pivots >= 0, axis=1)[:, None]
+    if not len(positions):
+        return mask
+
+    box_ends = positions + dimensions
+    reach = pivots + orientations.max(axis=0)
+    blocked = np.zeros(mask.shape, dtype=bool)
+    chunk = max(1, MAX_CHUNK_CELLS // len(positions))
+    for start in range(0, len(pivots), chunk):
+        rows = slice(start, start + chunk)
+        # Paired on length first, along which the points of a chunk, sorted by depth then length,
+        # lie closest together, then the pairs are narrowed down on the other two axes
+        near = (positions[None, :, 1] < reach[rows, None, 1]) & (pivots[rows, None, 1] < box_ends[None, :, 1])
+        pivot_rows, box_rows = np.nonzero(near)
+        pivot_rows += start
+        near = np.all((positions[box_rows] < reach[pivot_rows]) & (pivots[pivot_rows] < box_ends[box_rows]), axis=1)
+        pivot_rows, box_rows = pivot_rows[near], box_rows[near]
+        hit = np.all(
+            (positions[box_rows, None, :] < ends[pivot_rows]) & (pivots[pivot_rows, None, :] < box_ends[box_rows, None, :]),
+            axis=2
+        )
+        np.logical_or.at(blocked, pivot_rows, hit)
+        metrics.COLLISION_CHECKS.inc(hit.size)
+    return mask & ~blocked
+
+
+def search_points(bounds, positions: np.ndarray, dimensions: np.ndarray, points, orientations, chunk: int = 64,
+                  accept=None, choose=None, nearby=None, misfits=None) -> tuple:
+    """
+    Scans candidate points in order, up to `chunk` at a time, and returns (point, orientation index)
+    for the first point any orientation fits at, or None. Each chunk is only checked against
+    the boxes overlapping the region its placements can reach, as returned by
+    `nearby(low, high)`, by default a scan of the box arrays. `accept(point, orientation)`, when
+    given, further rules out fitting placements, e.g. ones without enough support underneath.
+    `choose(candidates, orientations, mask)`, when given, picks the (point index, orientation
+    index) to use from the first chunk with any fitting placement instead of its first one.
+    `misfits(points)`, when given, is called with the points of each chunk searched that none
+    of the orientations fits at, for lack of room rather than of `accept`.
+    """
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 3)
+    orientations = np.asarray(orientations, dtype=np.int64).reshape(-1, 3)
+    # Points without room for even the smallest orientation along every axis are skipped
+    room = np.asarray(bounds, dtype=np.int64) - points
+    points = points[np.all(room >= orientations.min(axis=0), axis=1)]
+    if nearby is None:
+        nearby = partial(overlapping, positions, dimensions)
+    reach = orientations.max(axis=0)
+    # A first fit is usually among the first points, so chunks start small and double up to
+    # `chunk`; a choice is made among the whole first chunk with any fit, so those stay whole
+    start, size = 0, chunk if choose is not None else min(chunk, FIRST_CHUNK)
+    while start < len(points):
+        candidates = points[start:start + size]
+        start, size = start + size, min(chunk, 2 * size)
+        rows = nearby(candidates.min(axis=0), candidates.max(axis=0) + reach)
+        mask = feasible_placements(bounds, positions[rows], dimensions[rows], candidates, orientations)
+        if misfits is not None:
+            misfits(candidates[~mask.any(axis=1)])
+        if choose is not None:
+            if accept is not None:
+                for point_index, orientation_index in zip(*np.nonzero(mask)):
+                    mask[point_index, orientation_index] = accept(candidates[point_index], orientations[orientation_index])
+            if mask.any():
+                point_index, orientation_index = choose(candidates, orientations, mask)
+                return tuple(int(coordinate) for coordinate in candidates[point_index]), int(orientation_index)
+            continue
+        for flat in np.flatnonzero(mask):
+            point_index, orientation_index = divmod(int(flat), mask.shape[1])
+            if accept is None or accept(candidates[point_index], orientations[orientation_index]):
+                return tuple(int(coordinate) for coordinate in candidates[point_index]), orientation_index
+    return None
@@ -0,0 +1,33 @@
+import time
+
+
+def volume(dimensions) -> int:
+    return int(dimensions[0]) * int(dimensions[1]) * int(dimensions[2])
+
+
+def first_fit_decreasing(states: list, items: list, deadline: float = None) -> dict:
+    """
+    Packs items, given as (key, orientations, weight) tuples, into the ContainerStates largest
+    volume first. States only ever fill up, so a run of identically shaped and weighted items
+    resumes from the first state that still had room for them instead of rescanning the full ones.
+    Returns {key: (state index, position, orientation index)} for every item that was placed,
+    leaving out those still unplaced once time.perf_counter() passes `deadline`.
+    """
+    placements: dict = {}
+    first_open: dict = {}
+    ordered: list = sorted(items, key=lambda item: (-volume(item[1][0]), sorted(item[1])))
+    for key, orientations, weight in ordered:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        shape: tuple = (tuple(sorted(tuple(orientation) for orientation in orientations)), weight)
+        for index in range(first_open.get(shape, 0), len(states)):
+            placement: tuple = states[index].find_placement(orientations, weight)
+            if placement is not None:
+                position, orientation_index = placement
+                states[index].add(key, position, orientations[orientation_index], weight)
+                placements[key] = (index, position, orientation_index)
+                first_open[shape] = index
+                break
+        else:
+            first_open[shape] = len(states)
+    return placements
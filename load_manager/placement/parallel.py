@@ -0,0 +1,59 @@
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .kernel import search_points
+from .state import EXTREME_POINT_CHUNK, most_balanced, with_room
+
+
+_pool: ProcessPoolExecutor = None
+_pool_workers: int = 0
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def _search_snapshot(task: tuple) -> tuple:
+    (bounds, positions, dimensions, points, rooms, tops, min_support, balance), orientations, weight = task
+    orientations = np.asarray(orientations, dtype=np.int64).reshape(-1, 3)
+    points = points[with_room(rooms, orientations)]
+    # The same support and balance rules as ContainerState.find_placement, applied to the snapshot
+    accept = (lambda position, box: tops.support(position, box) >= min_support) if tops is not None else None
+    choose = partial(most_balanced, bounds, *balance, weight) if balance is not None and weight else None
+    return search_points(bounds, positions, dimensions, points, orientations, EXTREME_POINT_CHUNK, accept, choose)
+
+
+def find_placements(snapshots: list, orientations: list, workers: int, weight: float = 0.0) -> list:
+    """
+    Runs the extreme point search for each ContainerState snapshot in a worker process and
+    returns the (position, orientation index) or None found for each in order, for a package
+    of the given weight. Snapshots are taken by the caller, under the lock of their container,
+    as a state changing while it is copied hands out arrays from before and after the change;
+    the caller commits the result.
+    """
+    tasks: list = [(snapshot, orientations, weight) for snapshot in snapshots]
+    chunksize: int = max(1, len(tasks) // (workers * 4))
+    return list(get_pool(workers).map(_search_snapshot, tasks, chunksize=chunksize))
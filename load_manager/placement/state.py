@@ -0,0 +1,457 @@
+import copy
+import math
+from collections import OrderedDict
+from functools import partial
+from itertools import permutations
+
+import numpy as np
+
+from utils import metrics
+
+from .grid import SpatialGrid
+from .kernel import BoxArray, collisions, feasible_placements, overlapping, search_points
+from .support import BoxTops
+
+
+# Number of extreme points scored per vectorized call; the search stops at the first chunk
+# holding a feasible placement, so a good spot near the floor is found without scoring the rest
+EXTREME_POINT_CHUNK = 64
+
+# Package shapes whose search frontier each state remembers, least recently used evicted first
+SHAPE_CACHE_SIZE = 256
+
+# Frontier of a shape that fits at none of the extreme points
+EXHAUSTED = float("inf")
+
+# Misfit slot of an extreme point not yet holding any shape
+NO_MISFIT = np.iinfo(np.int64).max
+
+# Misfits each extreme point remembers, the largest replaced first
+MISFITS_PER_POINT = 4
+
+
+class ContainerState():
+    """
+    Placed boxes of a single container, indexed both by a SpatialGrid for single-box
+    neighbourhood lookups and by a BoxArray for vectorized whole-container checks.
+
+    It also maintains the container's extreme points: the corners where a new box can sit
+    flush against the walls and already placed boxes. They are kept sorted bottom-up
+    (depth, then length, then width) so the first feasible one is the lowest, most packed spot,
+    each with its room: the free length along every axis up to the nearest box face or wall.
+    A search skips the points without room for the package, and a new point is dropped when a
+    point at or below it along every axis can take any box it could, so neither the search nor
+    the points grow with the boxes that are no longer reachable.
+
+    Searches remember, per package shape, the frontier: the first extreme point not known to
+    be infeasible for that shape. Placing boxes only takes room away, so every point before
+    the frontier stays infeasible and a run of identical packages resumes where the previous
+    one was placed, while a shape that fitted nowhere is rejected without searching again.
+    New extreme points ahead of a frontier pull it back. Each extreme point also remembers its
+    misfits: the sorted dimensions of the smallest few shapes that fitted there in none of their
+    rotations. A shape at least as large along every sorted axis as one of them fits there in
+    none of its orientations either, so searches for other shapes skip the points left below
+    the load.
+    Removing a box forgets frontiers and misfits and restores the extreme points the box had
+    covered, so the room it leaves can be filled again.
+
+    With `min_support` set, a box must also rest on the floor or on box tops under at least that
+    fraction of its base, checked against the BoxTops of the container.
+
+    Package weights add up to a running payload, checked against `max_payload` before any
+    geometry is searched. With `balanced` set, the search picks, among the lowest fitting spots
+    of the first extreme points that have any, the one keeping the load's centre of gravity
+    closest to the middle of the floor.
+    """
+
+    def __init__(self, width: int, length: int, depth: int, min_support: float = 0.0, max_payload: float = None,
+                 balanced: bool = False):
+        self.bounds: tuple = (width, length, depth)
+        self.grid: SpatialGrid = SpatialGrid(width, length, depth)
+        self.boxes: BoxArray = BoxArray()
+        # Extreme points ordered by _code, with their coordinates and room along each axis
+        self._codes: np.ndarray = np.zeros(1, dtype=np.int64)
+        self._coordinates: np.ndarray = np.zeros((1, 3), dtype=np.int64)
+        self._rooms: np.ndarray = np.array([self.bounds], dtype=np.int64)
+        self._misfits: np.ndarray = np.full((1, MISFITS_PER_POINT, 3), NO_MISFIT, dtype=np.int64)
+        self.used_volume: int = 0
+        # Top of the highest placed box
+        self.used_height: int = 0
+        self._free_box_bound: tuple = None
+        self._frontiers: OrderedDict = OrderedDict()
+        self.min_support: float = min_support
+        self.tops: BoxTops = BoxTops()
+        self.max_payload: float = max_payload
+        self.balanced: bool = balanced
+        self.payload: float = 0.0
+        self._weights: dict = {}
+        # Payload weighted sums of the box centres along width and length
+        self._moments: list = [0.0, 0.0]
+        # Version and layout of the stored container record these placements correspond to
+        self.version: int = None
+        self.layout: int = None
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @property
+    def volume(self) -> int:
+        return self.bounds[0] * self.bounds[1] * self.bounds[2]
+
+    @property
+    def free_volume(self) -> int:
+        return self.volume - self.used_volume
+
+    def free_box_bound(self) -> tuple:
+        """
+        Upper bound, as dimensions sorted largest first, on any box that can still be placed:
+        the room along each axis from every extreme point, maxed per sorted axis. A box this
+        size need not fit, as each axis may take its room from a different point, but no box
+        larger along any sorted axis does.
+        """
+        if self._free_box_bound is None:
+            if not len(self._rooms):
+                self._free_box_bound = (0, 0, 0)
+            else:
+                self._free_box_bound = tuple(int(size) for size in (-np.sort(-self._rooms, axis=1)).max(axis=0))
+        return self._free_box_bound
+
+    def may_carry(self, weight: float) -> bool:
+        return self.max_payload is None or self.payload + weight <= self.max_payload
+
+    def may_fit(self, orientations, weight: float = 0.0) -> bool:
+        if not self.may_carry(weight):
+            return False
+        dimensions: list = sorted(orientations[0], reverse=True)
+        if dimensions[0] * dimensions[1] * dimensions[2] > self.free_volume:
+            return False
+        return all(size <= free for size, free in zip(dimensions, self.free_box_bound()))
+
+    def extreme_points(self) -> list:
+        return [tuple(point) for point in self._coordinates.tolist()]
+
+    def balance_score(self, position=None, dimensions=None, weight: float = 0.0) -> float:
+        """
+        1 when the load's centre of gravity over the floor is dead centre, falling to 0 in a
+        corner, optionally as it would be with one more box of `weight` at `position`.
+        """
+        return balance_score(self.bounds, self.payload, self._moments, position, dimensions, weight)
+
+    @property
+    def prunes_points(self) -> bool:
+        # Dominated extreme points are only left out when no support or balance constraint applies
+        return not self.min_support and not self.balanced
+
+    def add(self, key, position, dimensions, weight: float = 0.0):
+        if key in self.boxes.rows:
+            self.remove(key)
+        self._place(key, position, dimensions, weight)
+        lowest: float = self._update_extreme_points(tuple(position), tuple(dimensions))
+        if self.min_support:
+            # The new top can support points at its height that were searched past before
+            lowest = min(lowest, self._code((0, 0, int(position[2]) + int(dimensions[2]))))
+        for shape, frontier in self._frontiers.items():
+            if lowest < frontier:
+                self._frontiers[shape] = lowest
+        self._free_box_bound = None
+
+    def restore(self, keys, boxes, weights, points):
+        """
+        Places the boxes, given as [x, y, z, width, length, depth], without searching for
+        extreme points, which are taken instead from `points` as point_rows() returned them
+        once the same boxes were placed. The points a run of adds and removes leaves depend on
+        its order, so they are restored as they were rather than worked out again.
+        """
+        for key, box, weight in zip(keys, boxes, weights):
+            self._place(key, box[:3], box[3:], weight)
+        rows: np.ndarray = np.array(points, dtype=np.int64).reshape(-1, 6)
+        codes: np.ndarray = (rows[:, 2] * self.bounds[1] + rows[:, 1]) * self.bounds[0] + rows[:, 0]
+        order: np.ndarray = np.argsort(codes, kind="stable")
+        self._codes, self._coordinates, self._rooms = codes[order], rows[order, :3], rows[order, 3:]
+        self._misfits = np.full((len(rows), MISFITS_PER_POINT, 3), NO_MISFIT, dtype=np.int64)
+        self._frontiers.clear()
+        self._free_box_bound = None
+
+    def point_rows(self) -> list:
+        # Extreme points as [x, y, z, room along width, length, depth], for restore()
+        return np.hstack([self._coordinates, self._rooms]).tolist()
+
+    def _place(self, key, position, dimensions, weight: float):
+        self.grid.insert(key, position, dimensions)
+        self.boxes.append(key, position, dimensions)
+        self.tops.add(key, position, dimensions)
+        self.used_volume += int(dimensions[0]) * int(dimensions[1]) * int(dimensions[2])
+        self.used_height = max(self.used_height, int(position[2]) + int(dimensions[2]))
+        self.payload += weight
+        self._weights[key] = weight
+        for axis in range(2):
+            self._moments[axis] += weight * (position[axis] + dimensions[axis] / 2)
+
+    def remove(self, key):
+        position, dimensions = self.grid.boxes[key]
+        self.grid.remove(key)
+        self.boxes.remove(key)
+        self.used_volume -= dimensions[0] * dimensions[1] * dimensions[2]
+        weight: float = self._weights.pop(key)
+        self.payload -= weight
+        for axis in range(2):
+            self._moments[axis] -= weight * (position[axis] + dimensions[axis] / 2)
+        self._frontiers.clear()
+        self._misfits[:] = NO_MISFIT
+        self._restore_extreme_points(tuple(position), tuple(dimensions))
+        self._free_box_bound = None
+        self.tops.remove(key)
+        if self.used_height not in self.tops.levels:
+            self.used_height = self.tops.highest()
+
+    def placements(self, keys) -> tuple:
+        """
+        Returns the placed box of each key as [x, y, z, width, length, depth], in the order
+        given, along with their weights.
+        """
+        boxes: list = []
+        for key in keys:
+            position, dimensions = self.grid.boxes[key]
+            boxes.append([int(value) for value in position] + [int(value) for value in dimensions])
+        return boxes, [self._weights[key] for key in keys]
+
+    def nearby(self, low, high) -> list:
+        # Rows of the boxes sharing grid cells with the region from `low` up to `high`
+        high = np.minimum(high, self.bounds)
+        return [self.boxes.rows[key] for key in self.grid.nearby(low, high - np.asarray(low))]
+
+    def collides(self, position, dimensions) -> bool:
+        nearby: list = self.nearby(position, np.add(position, dimensions))
+        metrics.COLLISION_CHECKS.inc(len(nearby))
+        return bool(nearby) and bool(collisions(*self.boxes.view(nearby), position, dimensions).any())
+
+    def feasible(self, pivots, orientations) -> np.ndarray:
+        pivots = np.asarray(pivots, dtype=np.int64).reshape(-1, 3)
+        orientations = np.asarray(orientations, dtype=np.int64).reshape(-1, 3)
+        if len(pivots) == 1:
+            # A single pivot only needs the boxes near the region its orientations can reach
+            nearby: list = self.nearby(pivots[0], pivots[0] + orientations.max(axis=0))
+            mask = feasible_placements(self.bounds, *self.boxes.view(nearby), pivots, orientations)
+        else:
+            mask = feasible_placements(self.bounds, *self.boxes.view(), pivots, orientations)
+        if self.min_support:
+            for point_index, orientation_index in zip(*np.nonzero(mask)):
+                mask[point_index, orientation_index] = self.supported(pivots[point_index], orientations[orientation_index])
+        return mask
+
+    def supported(self, position, dimensions) -> bool:
+        return not self.min_support or self.tops.support(position, dimensions) >= self.min_support
+
+    @metrics.timed("find_placement")
+    def find_placement(self, orientations, weight: float = 0.0) -> tuple:
+        """
+        Returns (position, orientation index) of the lowest extreme point any of the given
+        orientations fits at, or None when the box cannot be placed in this container.
+        """
+        orientations = np.asarray(orientations, dtype=np.int64).reshape(-1, 3)
+        if not len(orientations) or not self.may_fit(orientations.tolist(), weight):
+            return None
+        shape: tuple = tuple(map(tuple, orientations.tolist()))
+        frontier: float = self._frontiers.get(shape)
+        start: int = int(np.searchsorted(self._codes, frontier)) if frontier is not None else 0
+        size: np.ndarray = np.sort(orientations[0])
+        searched: np.ndarray = with_room(self._rooms[start:], orientations)
+        searched &= ~np.any(np.all(size >= self._misfits[start:], axis=2), axis=1)
+        points: np.ndarray = self._coordinates[start:][searched]
+        placement: tuple = None
+        choose = None
+        if len(points):
+            accept = self.supported if self.min_support else None
+            choose = partial(self._most_balanced, weight) if self.balanced and weight else None
+            # Only a shape searched in every rotation tells which larger shapes cannot fit either
+            rotations: set = set(permutations(size.tolist()))
+            misfits = partial(self._record_misfits, size) if set(shape) == rotations else None
+            placement = search_points(
+                self.bounds, *self.boxes.view(), points, orientations, EXTREME_POINT_CHUNK, accept, choose, self.nearby,
+                misfits
+            )
+        # A balanced pick may pass over feasible points, so only the first fit moves the frontier
+        if placement is None or not choose:
+            self._frontiers[shape] = self._code(placement[0]) if placement else EXHAUSTED
+            self._frontiers.move_to_end(shape)
+            if len(self._frontiers) > SHAPE_CACHE_SIZE:
+                self._frontiers.popitem(last=False)
+        return placement
+
+    def _record_misfits(self, size: np.ndarray, points: np.ndarray):
+        # Replaces, at each point, the largest of its misfits when `size` is a smaller box
+        codes: np.ndarray = (points[:, 2] * self.bounds[1] + points[:, 1]) * self.bounds[0] + points[:, 0]
+        indexes: np.ndarray = np.searchsorted(self._codes, codes)
+        volumes: np.ndarray = np.prod(self._misfits[indexes], axis=2, dtype=np.float64)
+        largest: np.ndarray = volumes.argmax(axis=1)
+        smaller: np.ndarray = volumes[np.arange(len(indexes)), largest] > np.prod(size, dtype=np.float64)
+        self._misfits[indexes[smaller], largest[smaller]] = size
+
+    def _most_balanced(self, weight: float, candidates: np.ndarray, orientations: np.ndarray, mask: np.ndarray) -> tuple:
+        return most_balanced(self.bounds, self.payload, self._moments, weight, candidates, orientations, mask)
+
+    def snapshot(self) -> tuple:
+        """
+        Compact, picklable copy of what an extreme point search needs, for use in another
+        process: the boxes, the extreme points and their room, the box tops when support is
+        required, and the payload and its moments when the load is balanced.
+        """
+        positions, dimensions = self.boxes.view()
+        return (
+            self.bounds, positions.copy(), dimensions.copy(), self._coordinates.copy(), self._rooms.copy(),
+            copy.deepcopy(self.tops) if self.min_support else None, self.min_support,
+            (self.payload, tuple(self._moments)) if self.balanced else None
+        )
+
+    def _project(self, point: tuple, axis: int) -> tuple:
+        # Slide the point towards the origin along one axis until it meets a box face or the wall
+        low: list = list(point)
+        low[axis] = 0
+        high: list = [coordinate + 1 for coordinate in point]
+        high[axis] = point[axis]
+        positions, dimensions = self.boxes.view(self.nearby(low, high))
+        ends = positions + dimensions
+        mask = ends[:, axis] <= point[axis]
+        for other in range(3):
+            if other != axis:
+                mask &= (positions[:, other] <= point[other]) & (point[other] < ends[:, other])
+        projected: list = list(point)
+        projected[axis] = int(ends[mask, axis].max()) if mask.any() else 0
+        return tuple(projected)
+
+    def _code(self, point) -> int:
+        # Orders points bottom-up: by depth, then length, then width
+        return (int(point[2]) * self.bounds[1] + int(point[1])) * self.bounds[0] + int(point[0])
+
+    def _ray(self, point: tuple, axis: int) -> int:
+        # Free length from the point along the axis up to the nearest box face or the wall
+        high: list = [coordinate + 1 for coordinate in point]
+        high[axis] = self.bounds[axis]
+        positions, dimensions = self.boxes.view(self.nearby(point, high))
+        ahead = overlapping(positions, dimensions, point, high)
+        return int(positions[ahead, axis].min()) - point[axis] if len(ahead) else self.bounds[axis] - point[axis]
+
+    def _keep_points(self, mask: np.ndarray):
+        self._codes, self._coordinates, self._rooms = self._codes[mask], self._coordinates[mask], self._rooms[mask]
+        self._misfits = self._misfits[mask]
+
+    def _blocked_by(self, position: np.ndarray, end: np.ndarray, axis: int) -> np.ndarray:
+        # Points whose ray along the axis runs into the box from `position` to `end`
+        within = (self._coordinates >= position) & (self._coordinates < end)
+        within[:, axis] = self._coordinates[:, axis] < position[axis]
+        return within.all(axis=1)
+
+    @metrics.timed("update_extreme_points")
+    def _update_extreme_points(self, position: tuple, dimensions: tuple) -> float:
+        start: np.ndarray = np.asarray(position, dtype=np.int64)
+        end: np.ndarray = start + np.asarray(dimensions, dtype=np.int64)
+        self._keep_points(~np.all((self._coordinates >= start) & (self._coordinates < end), axis=1))
+        for axis in range(3):
+            blocked: np.ndarray = self._blocked_by(start, end, axis)
+            self._rooms[blocked, axis] = np.minimum(self._rooms[blocked, axis], start[axis] - self._coordinates[blocked, axis])
+        candidates: list = []
+        for axis in range(3):
+            corner: list = [int(coordinate) for coordinate in position]
+            corner[axis] += int(dimensions[axis])
+            candidates.append(tuple(corner))
+            candidates.extend(self._project(tuple(corner), other) for other in range(3) if other != axis)
+        return self._insert_points(candidates)
+
+    def _restore_extreme_points(self, position: tuple, dimensions: tuple):
+        """
+        Gives back the room a removed box took from the extreme points behind it, and adds back
+        the points it covered: its own corner and the corners of the boxes around it that reach
+        into the room it left.
+        """
+        start: np.ndarray = np.asarray(position, dtype=np.int64)
+        end: np.ndarray = start + np.asarray(dimensions, dtype=np.int64)
+        for axis in range(3):
+            blocked: np.ndarray = self._blocked_by(start, end, axis)
+            blocked &= self._rooms[:, axis] == start[axis] - self._coordinates[:, axis]
+            for index in np.flatnonzero(blocked):
+                self._rooms[index, axis] = self._ray(tuple(self._coordinates[index].tolist()), axis)
+
+        position = tuple(int(coordinate) for coordinate in position)
+        inside = lambda point: all(position[axis] <= point[axis] < int(end[axis]) for axis in range(3))
+        # Widened by one towards the origin to take in the boxes whose far faces touch the room
+        low: tuple = tuple(max(0, value - 1) for value in position)
+        corners: list = [position]
+        for key in self.grid.nearby(low, tuple(int(end[axis]) - low[axis] for axis in range(3))):
+            other_position, other_dimensions = self.grid.boxes[key]
+            for axis in range(3):
+                corner: list = [int(coordinate) for coordinate in other_position]
+                corner[axis] += int(other_dimensions[axis])
+                if inside(corner):
+                    corners.append(tuple(corner))
+        self._insert_points(corners + [self._project(corner, axis) for corner in corners for axis in range(3)])
+
+    def _insert_points(self, candidates: list) -> float:
+        """
+        Adds the candidates that lie free inside the container and returns the lowest code added.
+        Without support or balance constraints, a candidate is left out when another one at or
+        below it along every axis has the whole region up to its far room free: any box fitting
+        at it then fits there too, and that point is searched first.
+        """
+        points: dict = {}
+        for candidate in candidates:
+            point: tuple = tuple(int(coordinate) for coordinate in candidate)
+            if any(point[axis] >= self.bounds[axis] for axis in range(3)):
+                continue
+            code: int = self._code(point)
+            index: int = int(np.searchsorted(self._codes, code))
+            if code in points or (index < len(self._codes) and self._codes[index] == code):
+                continue
+            if not self.collides(point, (1, 1, 1)):
+                points[code] = point
+        rooms: dict = {code: [self._ray(point, axis) for axis in range(3)] for code, point in points.items()}
+        if not self.min_support and not self.balanced:
+            for code, point in sorted(points.items(), reverse=True):
+                far: list = [point[axis] + rooms[code][axis] for axis in range(3)]
+                for other_code, other in points.items():
+                    if other_code != code and all(other[axis] <= point[axis] for axis in range(3)) and \
+                            not self.collides(other, [far[axis] - other[axis] for axis in range(3)]):
+                        del points[code]
+                        break
+        if not points:
+            return EXHAUSTED
+        codes: list = sorted(points)
+        indexes: np.ndarray = np.searchsorted(self._codes, codes)
+        self._codes = np.insert(self._codes, indexes, codes)
+        self._coordinates = np.insert(self._coordinates, indexes, [points[code] for code in codes], axis=0)
+        self._rooms = np.insert(self._rooms, indexes, [rooms[code] for code in codes], axis=0)
+        self._misfits = np.insert(self._misfits, indexes, NO_MISFIT, axis=0)
+        return codes[0]
+
+
+def with_room(rooms: np.ndarray, orientations: np.ndarray) -> np.ndarray:
+    # Mask of the extreme points with room along every axis for at least one of the orientations
+    return np.any(np.all(rooms[:, None, :] >= orientations[None, :, :], axis=2), axis=1)
+
+
+def balance_score(bounds: tuple, payload: float, moments, position=None, dimensions=None, weight: float = 0.0) -> float:
+    # See ContainerState.balance_score; kept apart so worker processes can score snapshots
+    payload += weight
+    if payload <= 0:
+        return 1.0
+    offsets: list = []
+    for axis in range(2):
+        moment: float = moments[axis]
+        if weight:
+            moment += weight * (position[axis] + dimensions[axis] / 2)
+        half: float = bounds[axis] / 2
+        offsets.append((moment / payload - half) / half)
+    return 1.0 - math.hypot(*offsets) / math.sqrt(2)
+
+
+def most_balanced(bounds: tuple, payload: float, moments, weight: float, candidates: np.ndarray,
+                  orientations: np.ndarray, mask: np.ndarray) -> tuple:
+    """
+    Picks, among the lowest fitting placements in `mask`, the (point index, orientation index)
+    keeping the centre of gravity closest to the middle of the floor.
+    """
+    rows, columns = np.nonzero(mask)
+    lowest = candidates[rows, 2].min()
+    options: list = [(row, column) for row, column in zip(rows, columns) if candidates[row, 2] == lowest]
+    return max(options, key=lambda option: balance_score(
+        bounds, payload, moments, candidates[option[0]], orientations[option[1]], weight
+    ))
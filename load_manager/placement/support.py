@@ -0,0 +1,52 @@
+import numpy as np
+
+from .kernel import BoxArray
+
+
+class BoxTops():
+    """
+    Top faces of the placed boxes, grouped by the height they lie at. A box resting at height z
+    is supported by the faces at z under its footprint, and since boxes never overlap neither
+    do faces at the same height, so the supported area is the sum of their overlaps with the
+    footprint. Memory grows with the boxes placed rather than with the floor area, and adding
+    or removing a box only touches the faces at its own top.
+    """
+
+    def __init__(self):
+        # Height -> BoxArray of the boxes whose top lies there
+        self.levels: dict = {}
+        self._tops: dict = {}
+
+    def add(self, key, position, dimensions):
+        top: int = int(position[2]) + int(dimensions[2])
+        level: BoxArray = self.levels.get(top)
+        if level is None:
+            level = self.levels[top] = BoxArray(capacity=8)
+        level.append(key, position, dimensions)
+        self._tops[key] = top
+
+    def remove(self, key):
+        top: int = self._tops.pop(key)
+        level: BoxArray = self.levels[top]
+        level.remove(key)
+        if not len(level):
+            del self.levels[top]
+
+    def highest(self) -> int:
+        return max(self.levels, default=0)
+
+    def support(self, position, dimensions) -> float:
+        """
+        Fraction of the footprint of a box at `position` that rests on the floor or on box tops.
+        """
+        x, y, z = (int(coordinate) for coordinate in position)
+        if z == 0:
+            return 1.0
+        level: BoxArray = self.levels.get(z)
+        if level is None:
+            return 0.0
+        positions, boxes = level.view()
+        low = np.array([x, y], dtype=np.int64)
+        high = low + np.array([int(dimensions[0]), int(dimensions[1])], dtype=np.int64)
+        overlaps = np.minimum(positions[:, :2] + boxes[:, :2], high) - np.maximum(positions[:, :2], low)
+        return float(np.clip(overlaps, 0, None).prod(axis=1).sum()) / (int(dimensions[0]) * int(dimensions[1]))
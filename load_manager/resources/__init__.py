@@ -1 +1 @@
-from . import (container, default, package)
\ No newline at end of file
+from . import (container, default, package, repack)
\ No newline at end of file
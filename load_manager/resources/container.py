@@ -1,29 +1,54 @@
+import json
+import math
 from http import HTTPStatus
 
+from flask import Response, current_app
 from flask_restful import Resource
-from webargs.fields import Int, Str, List
+from marshmallow import ValidationError
+from marshmallow.validate import OneOf, Range
+from webargs.fields import Bool, Float, Int, Raw, Str, List
 from webargs.flaskparser import use_kwargs
 
 from api.model.container import Container, ContainerSchema
+from api.storage import ConflictError
+from resources.listing import list_args, list_response
 
 
 class ContainerListResource(Resource):
-    def get(self):
+    @use_kwargs(list_args, location="query")
+    def get(self, cursor: str=None, limit: int=None, fields: str=None, format: str="json"):
         """
         View all containers
-        Get the list of all currently created containers and their contents
+        Get the list of all currently created containers and their contents, ordered by ID and optionally paged, projected or streamed
         ---
+        parameters:
+          - in: query
+            name: cursor
+            type: string
+            required: false
+            description: ID of the last container of the previous page, as returned in next_cursor
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            description: Maximum number of containers to return
+          - in: query
+            name: fields
+            type: string
+            required: false
+            example: id,packages
+            description: Comma separated container fields to include
+          - in: query
+            name: format
+            type: string
+            required: false
+            enum: [json, ndjson]
+            description: ndjson streams every container as one JSON object per line
         responses:
           200:
             description: Returns a list of all currently created containers
         """
-        containers: list = Container.get_all()
-        data = []
-        if containers:
-            for container in containers:
-                data.append(container.data())
-            return {"data": data}, HTTPStatus.OK
-        return {"msg": "no containers available"}, HTTPStatus.BAD_REQUEST
+        return list_response(Container.query, "containers", cursor, limit, fields, format)
 
 
 class ContainerGetResource(Resource):
@@ -65,19 +90,114 @@ class ContainerGetResource(Resource):
         return {"msg": f"{container.data()}"}, HTTPStatus.OK
 
 
+class ContainerStatsResource(Resource):
+    def get(self, container_id: str):
+        """
+        Utilization of a specific container
+        Returns the container's fill ratio, free volume, package count, free box bound, payload and balance, as kept up to date on every save
+        ---
+        parameters:
+          - in: path
+            name: container_id
+            type: string
+            required: true
+            example: A1
+        responses:
+          200:
+            description: Utilization of the container
+            schema:
+              id: ContainerStats
+              properties:
+                id:
+                  type: string
+                package_count:
+                  type: integer
+                volume:
+                  type: integer
+                used_volume:
+                  type: integer
+                free_volume:
+                  type: integer
+                fill_ratio:
+                  type: number
+                free_box_bound:
+                  type: array
+                  description: Upper bound on the dimensions, largest first, of a box that can still be placed. A box this size need not fit, but no box larger along any of them does
+                  items:
+                    type: integer
+                used_height:
+                  type: integer
+                  description: Top of the highest package
+                payload:
+                  type: number
+                max_payload:
+                  type: number
+                balance_score:
+                  type: number
+                  description: 1 when the load's centre of gravity is in the middle of the floor, 0 in a corner
+        """
+        container: Container = Container.get_by_id(container_id)
+        if container is None:
+            return {"message": f"Container not found with ID {container_id}"}, HTTPStatus.NOT_FOUND
+        return container.stats(), HTTPStatus.OK
+
+
+class FleetStatsResource(Resource):
+    @use_kwargs({"containers": Bool(required=False, load_default=False)}, location="query")
+    def get(self, containers: bool=False):
+        """
+        Utilization of the whole fleet
+        Returns the fill ratio, free volume and payload totals over every container, summed from the per-container figures kept up to date on every save and read without the containers' packages and placements; free_box_bound is the container bound of largest volume
+        ---
+        parameters:
+          - in: query
+            name: containers
+            type: boolean
+            required: false
+            description: Also list the utilization of every container, ordered by ID
+        responses:
+          200:
+            description: Utilization totals of the fleet
+        """
+        stats: list = Container.get_all_stats()
+        result: dict = fleet_stats(stats)
+        if containers:
+            result["containers"] = sorted(stats, key=lambda item: item["id"])
+        return result, HTTPStatus.OK
+
+
+def fleet_stats(stats: list) -> dict:
+    volume: int = sum(item["volume"] for item in stats)
+    used_volume: int = sum(item["used_volume"] for item in stats)
+    largest: dict = max(stats, key=lambda item: math.prod(item["free_box_bound"]), default=None)
+    return {
+        "container_count": len(stats),
+        "empty_containers": sum(1 for item in stats if not item["package_count"]),
+        "package_count": sum(item["package_count"] for item in stats),
+        "volume": volume,
+        "used_volume": used_volume,
+        "free_volume": volume - used_volume,
+        "fill_ratio": used_volume / volume if volume else 0.0,
+        "free_box_bound": largest["free_box_bound"] if largest else None,
+        "free_box_bound_container": largest["id"] if largest else None,
+        "payload": sum(item["payload"] for item in stats)
+    }
+
+
 class ContainerCreateResource(Resource):
     @use_kwargs(
         {
             "id": Str(required=True, location="json"),
-            "length": Int(required=True, location="json"),
-            "width": Int(required=True, location="json"),
-            "depth": Int(required=True, location="json")
+            "length": Int(required=True, location="json", validate=Range(min=1)),
+            "width": Int(required=True, location="json", validate=Range(min=1)),
+            "depth": Int(required=True, location="json", validate=Range(min=1)),
+            "max_payload": Float(required=False, location="json", validate=Range(min=0))
         }
     )
-    def post(self, id: str, length: int, width: int, depth: int):
+    def post(self, id: str, length: int, width: int, depth: int, max_payload: float=None):
         """
         Creates a new container record
-        Provided a container's ID and dimensions, a new container record will be created
+        Provided a container's ID and dimensions (and optionally the total package weight it can carry), a new container record will be created
         ---
         parameters:
           - in: body
@@ -100,6 +220,12 @@ class ContainerCreateResource(Resource):
             type: integer
             required: true
             example: 5
+          - in: body
+            name: max_payload
+            type: number
+            required: false
+            example: 1000
+            description: Total package weight the container can carry, unlimited when omitted
         responses:
           200:
             description: Creates a new Container record
@@ -108,7 +234,111 @@ class ContainerCreateResource(Resource):
         if container:
             return {"message": f"A container with that ID already exists: {container.data()}"}, HTTPStatus.BAD_REQUEST
 
-        container: Container = Container(id, width, length, depth)
-        container.save()
+        container: Container = Container(id, width, length, depth, max_payload=max_payload)
+        try:
+            container.save()
+        except ConflictError:
+            return {"message": f"A container with that ID already exists: {id}"}, HTTPStatus.BAD_REQUEST
+
+        return {"msg": f"Container successfully created - {container.data()}"}, HTTPStatus.CREATED
+
+
+class ContainerBatchResource(Resource):
+    @use_kwargs({"containers": List(Raw(), required=True, location="json")})
+    @use_kwargs({"format": Str(required=False, load_default="json", validate=OneOf(["json", "ndjson"]))}, location="query")
+    def post(self, containers: list, format: str="json"):
+        """
+        Imports a fleet of containers in one pass
+        Provided a list of containers, validates them all, skips any whose ID is repeated or already taken and creates the rest in a single write, returning one result per container in order
+        ---
+        parameters:
+          - in: body
+            name: containers
+            type: array
+            required: true
+            items:
+              type: object
+              properties:
+                id:
+                  type: string
+                  example: A1
+                length:
+                  type: integer
+                  example: 10
+                width:
+                  type: integer
+                  example: 4
+                depth:
+                  type: integer
+                  example: 5
+                max_payload:
+                  type: number
+                  example: 1000
+          - in: query
+            name: format
+            type: string
+            required: false
+            enum: [json, ndjson]
+            description: ndjson streams the results as one JSON object per line
+        responses:
+          201:
+            description: Lists the result for each container, created or rejected with the reason
+        """
+        results: list = import_containers(containers)
+        status: HTTPStatus = HTTPStatus.CREATED if any(result["status"] == "created" for result in results) else HTTPStatus.BAD_REQUEST
+        if format == "ndjson":
+            return Response((json.dumps(result) + "\n" for result in results), status=status, mimetype="application/x-ndjson")
+        return {"results": results}, status
+
+
+def import_containers(items: list) -> list:
+    """
+    Validates a fleet with ContainerSchema and creates every container that does not exist yet
+    in one write. Returns a result per item, in order, with its status: created, invalid,
+    repeated, exists or conflict when other writers kept creating the same IDs meanwhile.
+    """
+    schema: ContainerSchema = ContainerSchema(many=True)
+    errors: dict = schema.validate(items)
+    results: list = []
+    accepted: dict = {}
+    for index, item in enumerate(items):
+        id: str = item.get("id") if isinstance(item, dict) else None
+        results.append({"index": index, "id": id})
+        if index in errors:
+            results[index].update({"status": "invalid", "errors": errors[index]})
+        elif item.get("packages"):
+            results[index].update({"status": "invalid", "errors": {"packages": ["Containers are imported empty"]}})
+        elif id in accepted:
+            results[index].update({"status": "repeated", "message": "Container ID is repeated in the fleet"})
+        else:
+            accepted[id] = index
+
+    containers: list = []
+    single: ContainerSchema = ContainerSchema()
+    for id, index in list(accepted.items()):
+        # One item failing to load is reported as invalid without failing the rest of the fleet
+        try:
+            containers.append(single.load(items[index]))
+        except (ValidationError, TypeError) as error:
+            messages = error.messages if isinstance(error, ValidationError) else {"_schema": [str(error)]}
+            results[index].update({"status": "invalid", "errors": messages})
+            del accepted[id]
+    for _ in range(current_app.config["PLACEMENT_RETRIES"]):
+        new: list = []
+        for container in containers:
+            if container.id in Container.store:
+                results[accepted[container.id]].update({"status": "exists", "message": "A container with that ID already exists"})
+            else:
+                new.append(container)
+        try:
+            Container.save_all(new)
+        except ConflictError:
+            containers = new
+            continue
+        for container in new:
+            results[accepted[container.id]]["status"] = "created"
+        return results
 
-        return {"msg": f"Container successfully created - {container.data()}"}, HTTPStatus.CREATED
\ No newline at end of file
+    for container in containers:
+        results[accepted[container.id]].update({"status": "conflict", "message": "Containers with these IDs kept being created concurrently"})
+    return results
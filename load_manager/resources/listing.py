@@ -0,0 +1,51 @@
+import json
+from http import HTTPStatus
+
+from flask import Response, current_app, stream_with_context
+from marshmallow.validate import OneOf, Range
+from webargs.fields import Int, Str
+
+
+list_args = {
+    "cursor": Str(required=False),
+    "limit": Int(required=False, validate=Range(min=1)),
+    "fields": Str(required=False),
+    "format": Str(required=False, load_default="json", validate=OneOf(["json", "ndjson"]))
+}
+
+
+def project(data: dict, fields: list) -> dict:
+    if not fields:
+        return data
+    return {field: data[field] for field in fields if field in data}
+
+
+def list_response(query, name: str, cursor: str = None, limit: int = None, fields: str = None, format: str = "json"):
+    """
+    Lists records through `query(after=..., limit=...)`, ordered by id and starting after the
+    `cursor` id. JSON responses carry one page plus the cursor for the next one; NDJSON
+    responses stream every remaining record page by page, one object per line.
+    """
+    fields: list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    if format == "ndjson":
+        page_size: int = current_app.config["LIST_PAGE_SIZE"]
+        return Response(stream_with_context(stream_records(query, cursor, limit, fields, page_size)), mimetype="application/x-ndjson")
+
+    items: list = query(after=cursor, limit=limit)
+    if not items and cursor is None:
+        return {"msg": f"no {name} available"}, HTTPStatus.BAD_REQUEST
+    next_cursor: str = items[-1].id if limit and len(items) == limit else None
+    return {"data": [project(item.data(), fields) for item in items], "next_cursor": next_cursor}, HTTPStatus.OK
+
+
+def stream_records(query, cursor: str, limit: int, fields: list, page_size: int):
+    sent: int = 0
+    while limit is None or sent < limit:
+        size: int = page_size if limit is None else min(page_size, limit - sent)
+        page: list = query(after=cursor, limit=size)
+        for item in page:
+            yield json.dumps(project(item.data(), fields)) + "\n"
+        sent += len(page)
+        if len(page) < size:
+            return
+        cursor = page[-1].id
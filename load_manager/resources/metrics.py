@@ -0,0 +1,17 @@
+from flask import Response
+from flask_restful import Resource
+
+from utils import metrics
+
+
+class MetricsResource(Resource):
+    def get(self):
+        """
+        Placement and storage metrics
+        Request counts and latencies, time spent per placement and storage operation, and placement search counters, in the Prometheus text format. Send an X-Profile header on any request to get its own timing breakdown back in the Server-Timing response header
+        ---
+        responses:
+          200:
+            description: Metrics of this server process in the Prometheus text exposition format
+        """
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -1,113 +1,155 @@
+from contextlib import ExitStack
+from functools import partial
 from http import HTTPStatus
 
+from flask import current_app
 from flask_restful import Resource
-from webargs.fields import Int, Str
+from marshmallow.validate import OneOf, Range
+from webargs.fields import Float, Int, List, Nested, Str
 from webargs.flaskparser import use_kwargs
 
+from api.model.box_rotation_type import RotationConstraint
 from api.model.container import Container
-from api.model.package import Package, PackageSchema
+from api.model.package import Package
+from api.storage import ConflictError
+from placement import parallel
+from placement.packer import first_fit_decreasing
+from placement.state import ContainerState
+from resources.listing import list_args, list_response
+from utils import metrics
 
 
-def rect_intersect(item1, item2, x, y):
-    d1 = item1.get_dimensions()
-    d2 = item2.get_dimensions()
-
-    cx1 = item1.position[x] + d1[x]/2
-    cy1 = item1.position[y] + d1[y]/2
-    cx2 = item2.position[x] + d2[x]/2
-    cy2 = item2.position[y] + d2[y]/2
-
-    ix = max(cx1, cx2) - min(cx1, cx2)
-    iy = max(cy1, cy2) - min(cy1, cy2)
-
-    return ix < (d1[x]+d2[x])/2 and iy < (d1[y]+d2[y])/2
-
-
-class Axis:
-    WIDTH = 0
-    LENGTH = 1
-    DEPTH = 2
+@metrics.timed("load_package_to_container")
+def load_package_to_container(container: Container, package: Package) -> bool:
+    state: ContainerState = container.placement_state()
+    rotation_codes: list = package.get_rotation_items()
+    orientations: list = package.get_orientations()
+    metrics.ROTATIONS_TRIED.inc(len(orientations))
+    metrics.CONTAINERS_SCANNED.inc()
+    placement: tuple = state.find_placement(orientations, package.weight)
+    if placement is None:
+        return False
+    position, orientation_index = placement
+    return commit_placement(state, package, position, rotation_codes[orientation_index])
 
-    ALL = [WIDTH, LENGTH, DEPTH]
 
+def load_package_to_any_container(containers: list, package: Package) -> Container:
+    """
+    Places the package into the first of the containers with room for it and saves both.
+    Each container is read again, then searched and saved, under its own lock, so placements
+    into different containers proceed in parallel, and the save is version-checked against
+    other processes.
+    """
+    workers: int = current_app.config["PLACEMENT_WORKERS"]
+    placed_boxes: int = sum(container.package_count for container in containers)
+    if workers and len(containers) > 1 and placed_boxes >= current_app.config["PLACEMENT_PARALLEL_MIN_BOXES"]:
+        rotation_codes: list = package.get_rotation_items()
+        orientations: list = package.get_orientations()
+        snapshots: list = []
+        for container in containers:
+            with Container.lock(container.id):
+                stored: Container = Container.get_by_id(container.id)
+                # One deleted meanwhile is searched empty and skipped below
+                state: ContainerState = stored.placement_state() if stored else container.new_placement_state()
+                snapshots.append(state.snapshot())
+        for container, placement in zip(containers, parallel.find_placements(snapshots, orientations, workers, package.weight)):
+            if placement is None:
+                continue
+            position, orientation_index = placement
+            with Container.lock(container.id):
+                container = Container.get_by_id(container.id)
+                if container is None:
+                    continue
+                state: ContainerState = container.placement_state()
+                # The search ran on a snapshot, so confirm the spot is still free before committing it
+                if state.may_carry(package.weight) and state.feasible([position], [orientations[orientation_index]])[0, 0]:
+                    commit_placement(state, package, position, rotation_codes[orientation_index])
+                    if save_placement(container, package):
+                        return container
 
-def intersect(item1, item2):
-    return (
-        rect_intersect(item1, item2, Axis.WIDTH, Axis.LENGTH) and
-        rect_intersect(item1, item2, Axis.LENGTH, Axis.DEPTH) and
-        rect_intersect(item1, item2, Axis.WIDTH, Axis.DEPTH)
-    )
+    for container in containers:
+        for _ in range(current_app.config["PLACEMENT_RETRIES"]):
+            with Container.lock(container.id):
+                container = Container.get_by_id(container.id)
+                if container is None or not load_package_to_container(container, package):
+                    break
+                if save_placement(container, package):
+                    return container
+    return None
 
 
-def load_package(container: Container, package: Package, pivot_point: list) -> bool:
-    loaded: bool = False
-    initial_package_position: list = package.position
-    package.position = list(pivot_point)
-    for rotation_code in package.get_rotation_items():
-        package.rotation_orientation = rotation_code
-        dimensions = package.get_dimensions()
+def save_placement(container: Container, package: Package) -> bool:
+    """
+    Saves a placement made in the container's state, the package first so a concurrent create
+    of the same ID fails with ConflictError. Returns False, with nothing saved, if the
+    container was changed by another process in the meantime.
+    """
+    package.container_id = container.id
+    try:
+        package.save(new=True)
+    except ConflictError:
+        container.discard_placement_state()
+        raise
 
-        # 1) Ensure package placed in rotation will not exceed container boundaries
-        if container.width < pivot_point[0] + dimensions[0] or \
-            container.length < pivot_point[1] + dimensions[1] or \
-                container.depth < pivot_point[2] + dimensions[2]:
-            continue
-        loaded = True
-
-        # 2) Check if new package placement will collide with already loaded packages
-        for loaded_package_id in container.packages:
-            loaded_package: Package = Package.get_by_id(loaded_package_id)
-            if intersect(loaded_package, package):
-                loaded = False
-                break
-        
-    if not loaded:
-        package.position = initial_package_position
-    
-    return loaded
+    container.packages.append(package.id)
+    try:
+        container.save()
+    except ConflictError:
+        container.packages.remove(package.id)
+        Package.store.delete_many([package.id])
+        metrics.PLACEMENT_CONFLICTS.inc()
+        return False
+    return True
 
 
-def load_package_to_container(container: Container, package: Package) -> bool:
-    loaded: bool = False
-    if not container.packages:
-        loaded = load_package(container, package, [0,0,0])
-        if loaded:
-            return loaded
-    
-    for axis in Axis.ALL:
-        for preloaded_package_id in container.packages:
-            preloaded_package: Package = Package.get_by_id(preloaded_package_id)
-            pivot = preloaded_package.position
-            w, l, d = preloaded_package.get_dimensions()
-            if axis == Axis.WIDTH:
-                pivot[0] = pivot[0] + w
-            elif axis == Axis.LENGTH:
-                pivot[1] = pivot[1] + l
-            elif axis == Axis.DEPTH:
-                pivot[2] = pivot[2] + d
-            loaded = load_package(container, package, pivot)
-            if loaded:
-                return loaded
-    return loaded
+def commit_placement(state: ContainerState, package: Package, position: tuple, rotation_code: int) -> bool:
+    package.position = position
+    package.rotation_orientation = rotation_code
+    state.add(package.id, position, package.get_dimensions(), package.weight)
+    return True
 
 
 class PackageListResource(Resource):
-    def get(self):
+    @use_kwargs({**list_args, "container_id": Str(required=False)}, location="query")
+    def get(self, cursor: str=None, limit: int=None, fields: str=None, format: str="json", container_id: str=None):
         """
         View all packages
-        Get the list of all currently created packages
+        Get the list of all currently created packages, ordered by ID and optionally filtered by container, paged, projected or streamed
         ---
+        parameters:
+          - in: query
+            name: container_id
+            type: string
+            required: false
+            description: Only list packages loaded into this container
+          - in: query
+            name: cursor
+            type: string
+            required: false
+            description: ID of the last package of the previous page, as returned in next_cursor
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            description: Maximum number of packages to return
+          - in: query
+            name: fields
+            type: string
+            required: false
+            example: id,container_id,position
+            description: Comma separated package fields to include
+          - in: query
+            name: format
+            type: string
+            required: false
+            enum: [json, ndjson]
+            description: ndjson streams every package as one JSON object per line
         responses:
           200:
             description: Returns a list of all currently created packages
         """
-        packages: list = Package.get_all()
-        data = []
-        if packages:
-            for package in packages:
-                data.append(package.data())
-            return {"data": data}, HTTPStatus.OK
-        return {"msg": "no packages available"}, HTTPStatus.BAD_REQUEST
+        query = partial(Package.query, container_id=container_id)
+        return list_response(query, "packages", cursor, limit, fields, format)
 
 
 class PackageGetResource(Resource):
@@ -154,6 +196,59 @@ class PackageGetResource(Resource):
         return {"msg": f"{package.data()}"}, HTTPStatus.OK
 
 
+class PackageDeleteResource(Resource):
+    def delete(self, package_id: str):
+        """
+        Unloads and deletes a package
+        Takes the package out of the container it is loaded in, freeing its space for new packages, and deletes its record
+        ---
+        parameters:
+          - in: path
+            name: package_id
+            type: string
+            required: true
+            example: A1
+        responses:
+          200:
+            description: The package was unloaded and deleted
+          404:
+            description: No package exists with that ID
+          409:
+            description: The container kept changing while the package was being unloaded
+        """
+        package: Package = Package.get_by_id(package_id)
+        if package is None:
+            return {"message": f"Package not found with ID {package_id}"}, HTTPStatus.NOT_FOUND
+        if package.container_id and not unload_package(package):
+            return {"message": f"Container {package.container_id} kept changing, package {package_id} was not unloaded"}, HTTPStatus.CONFLICT
+        package.delete()
+        return {"msg": f"Package successfully deleted - {package.data()}"}, HTTPStatus.OK
+
+
+def unload_package(package: Package) -> bool:
+    """
+    Removes the package from its container's packages and placement state and saves the
+    container, retrying when another process changed it meanwhile, or following the package
+    when a repack moved it to another container. Returns False if every attempt conflicted.
+    """
+    for _ in range(current_app.config["PLACEMENT_RETRIES"]):
+        with Container.lock(package.container_id):
+            container: Container = Container.get_by_id(package.container_id)
+            if container is None or package.id not in container.packages:
+                current: Package = Package.get_by_id(package.id)
+                if current is None or current.container_id in (None, package.container_id):
+                    return True
+                package.container_id = current.container_id
+                continue
+            container.unload(package.id)
+            try:
+                container.save()
+                return True
+            except ConflictError:
+                metrics.PLACEMENT_CONFLICTS.inc()
+    return False
+
+
 class PackageCreateResource(Resource):
     @use_kwargs(
         {
@@ -161,10 +256,12 @@ class PackageCreateResource(Resource):
             "length": Int(required=True, location="json"),
             "width": Int(required=True, location="json"),
             "depth": Int(required=True, location="json"),
-            "container_id": Str(required=False, location="json")
+            "container_id": Str(required=False, location="json"),
+            "rotation_constraint": Str(required=False, location="json", validate=OneOf(RotationConstraint.ALL)),
+            "weight": Float(required=False, location="json", validate=Range(min=0))
         }
     )
-    def post(self, id: str, length: int, width: int, depth: int, container_id: str=None):
+    def post(self, id: str, length: int, width: int, depth: int, container_id: str=None, rotation_constraint: str=RotationConstraint.ANY, weight: float=0.0):
         """
         Creates a new package record
         Provided a package's ID and dimensions (and optionally a container_id), a new package record will be created and loaded onto the first available container
@@ -195,6 +292,18 @@ class PackageCreateResource(Resource):
             type: string
             required: false
             example: A1
+          - in: body
+            name: rotation_constraint
+            type: string
+            required: false
+            enum: [any, this_side_up, none]
+            description: any rotation, only rotations keeping the depth side vertical, or no rotation at all
+          - in: body
+            name: weight
+            type: number
+            required: false
+            example: 12.5
+            description: Counted against the max_payload of the container it is loaded into
         responses:
           200:
             description: Creates a new Package record
@@ -203,27 +312,176 @@ class PackageCreateResource(Resource):
         if package:
             return {"message": f"A package with that ID already exists: {package.data()}"}, HTTPStatus.BAD_REQUEST
         
-        package: Package = Package(id, width, length, depth, container_id)
-        loaded_container: Container = None
+        package: Package = Package(id, width, length, depth, container_id, rotation_constraint=rotation_constraint, weight=weight)
         if container_id:
             container: Container = Container.get_by_id(container_id)
             if not container:
                 return {"message": f"No container exists with id {container_id}"}, HTTPStatus.BAD_REQUEST
-            loaded_container = container if load_package_to_container(container, package) else None
+            candidates: list = [container]
         else:
-            containers: list = list(Container.get_by_id(container_id)) if container_id else Container.get_all()
-            if not containers:
+            if not len(Container.store):
                 return {"message": f"No containers created yet to load package to"}, HTTPStatus.BAD_REQUEST
 
-            for container in containers:
-                loaded_container = container if load_package_to_container(container, package) else None
-                if loaded_container:
-                    break
-        
+            # Skip containers that cannot hold the package at all and try the fullest ones first
+            candidates: list = Container.candidates(package.get_orientations(), package.weight)
+
+        try:
+            loaded_container: Container = load_package_to_any_container(candidates, package)
+        except ConflictError:
+            return {"message": f"A package with that ID already exists: {id}"}, HTTPStatus.BAD_REQUEST
+
         if loaded_container:
-            package.container_id = loaded_container.id
-            package.save()
-            loaded_container.packages.append(package.id)
-            loaded_container.save()
             return {"msg": f"Package loaded successfully - {package.data()}"}, HTTPStatus.CREATED
+        package.container_id = container_id
         return {"message": f"Could not find suitable container for {package.data()}"}, HTTPStatus.BAD_REQUEST
+
+
+class PackageBatchResource(Resource):
+    @use_kwargs(
+        {
+            "packages": List(
+                Nested(
+                    {
+                        "id": Str(required=True),
+                        "length": Int(required=True, validate=Range(min=1)),
+                        "width": Int(required=True, validate=Range(min=1)),
+                        "depth": Int(required=True, validate=Range(min=1)),
+                        "container_id": Str(required=False),
+                        "rotation_constraint": Str(required=False, validate=OneOf(RotationConstraint.ALL)),
+                        "weight": Float(required=False, validate=Range(min=0))
+                    }
+                ),
+                required=True,
+                location="json"
+            )
+        }
+    )
+    def post(self, packages: list):
+        """
+        Loads a manifest of packages in one pass
+        Provided a list of packages (each optionally with a container_id), packs them largest volume first across the available containers and saves every placement in a single write
+        ---
+        parameters:
+          - in: body
+            name: packages
+            type: array
+            required: true
+            items:
+              type: object
+              properties:
+                id:
+                  type: string
+                  example: A1
+                length:
+                  type: integer
+                  example: 2
+                width:
+                  type: integer
+                  example: 2
+                depth:
+                  type: integer
+                  example: 2
+                container_id:
+                  type: string
+                  example: A1
+                rotation_constraint:
+                  type: string
+                  enum: [any, this_side_up, none]
+                weight:
+                  type: number
+                  example: 12.5
+        responses:
+          201:
+            description: Lists the packages that were loaded and any that could not be placed
+        """
+        container_ids: list = Container.store.keys()
+        if not container_ids:
+            return {"message": f"No containers created yet to load packages to"}, HTTPStatus.BAD_REQUEST
+
+        unplaced: list = []
+        requested: dict = {}
+        for item in packages:
+            if item["id"] in requested:
+                unplaced.append({"id": item["id"], "message": "Package ID is repeated in the manifest"})
+            elif Package.get_by_id(item["id"]):
+                unplaced.append({"id": item["id"], "message": "A package with that ID already exists"})
+            elif item.get("container_id") and item["container_id"] not in container_ids:
+                unplaced.append({"id": item["id"], "message": f"No container exists with id {item['container_id']}"})
+            else:
+                requested[item["id"]] = item
+
+        # The whole fleet is locked, in a fixed order, while the manifest is packed and saved
+        with ExitStack() as stack:
+            for container_id in container_ids:
+                stack.enter_context(Container.lock(container_id))
+            for _ in range(current_app.config["PLACEMENT_RETRIES"]):
+                loaded, failed, loaded_containers = pack_manifest(list(requested.values()), container_ids)
+                if not loaded:
+                    break
+                try:
+                    Package.save_all(loaded, new=True)
+                except ConflictError:
+                    for container in loaded_containers:
+                        container.discard_placement_state()
+                    return {"message": "Packages with these IDs were created concurrently, nothing was loaded"}, HTTPStatus.CONFLICT
+                try:
+                    Container.save_all(loaded_containers)
+                    break
+                except ConflictError:
+                    Package.store.delete_many([package.id for package in loaded])
+            else:
+                return {"message": "Containers kept changing while loading the manifest, nothing was loaded"}, HTTPStatus.CONFLICT
+
+        unplaced.extend(failed)
+        if not loaded:
+            return {"message": "Could not find suitable containers for any package", "unplaced": unplaced}, HTTPStatus.BAD_REQUEST
+        return {"placed": [package.data() for package in loaded], "unplaced": unplaced}, HTTPStatus.CREATED
+
+
+def pack_manifest(items: list, container_ids: list) -> tuple:
+    """
+    Packs manifest entries into the given containers, which the caller holds the locks of,
+    returning the placed packages, the entries that did not fit and the containers that took
+    packages. Containers created since their ids were read are left out. Nothing is saved here.
+    """
+    containers: list = [container for container in map(Container.get_by_id, container_ids) if container]
+    container_indexes: dict = {container.id: index for index, container in enumerate(containers)}
+    requested: list = [
+        Package(
+            item["id"], item["width"], item["length"], item["depth"], item.get("container_id"),
+            rotation_constraint=item.get("rotation_constraint", RotationConstraint.ANY), weight=item.get("weight", 0.0)
+        )
+        for item in items
+    ]
+
+    # Packages pinned to a container are packed into it first, the rest across the whole fleet
+    states: list = [container.placement_state() for container in containers]
+    groups: dict = {}
+    for package in requested:
+        groups.setdefault(package.container_id, []).append(package)
+
+    loaded: list = []
+    failed: list = []
+    loaded_containers: dict = {}
+    for container_id, group in sorted(groups.items(), key=lambda item: item[0] is None):
+        if container_id and container_id not in container_indexes:
+            failed.extend({"id": package.id, "message": f"No container exists with id {container_id}"} for package in group)
+            continue
+        candidates: list = [container_indexes[container_id]] if container_id else list(range(len(containers)))
+        placements: dict = first_fit_decreasing(
+            [states[index] for index in candidates], [(package.id, package.get_orientations(), package.weight) for package in group]
+        )
+        for package in group:
+            if package.id not in placements:
+                failed.append({"id": package.id, "message": "Could not find suitable container"})
+                continue
+            candidate_index, position, orientation_index = placements[package.id]
+            container: Container = containers[candidates[candidate_index]]
+            package.container_id = container.id
+            package.position = position
+            package.rotation_orientation = package.get_rotation_items()[orientation_index]
+            container.packages.append(package.id)
+            loaded.append(package)
+            loaded_containers[container.id] = container
+
+    return loaded, failed, list(loaded_containers.values())
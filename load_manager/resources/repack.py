@@ -0,0 +1,215 @@
+import threading
+import time
+from contextlib import ExitStack
+from http import HTTPStatus
+
+from flask import current_app
+from flask_restful import Resource
+from marshmallow.validate import Range
+from webargs.fields import Float, List, Str
+from webargs.flaskparser import use_kwargs
+
+from api.model.container import Container
+from api.model.package import Package
+from api.model.repack_job import RepackJob
+from api.storage import ConflictError
+from placement.packer import first_fit_decreasing
+from placement.state import ContainerState
+from utils import metrics
+
+
+def headroom(state: ContainerState) -> int:
+    # Room above the highest package, the whole container once it is empty
+    width, length, depth = state.bounds
+    return width * length * (depth - state.used_height)
+
+
+@metrics.timed("repack")
+def repack(container_ids: list, time_limit: float) -> dict:
+    """
+    Packs the packages of the given containers, or of the whole fleet, again from scratch,
+    fullest containers first so the emptiest ones are freed, and saves the new layout when it
+    leaves more headroom, the room above each container's highest package, than the current
+    one. Keeps the current layout if the packing is not done within `time_limit` seconds.
+    """
+    started: float = time.perf_counter()
+    if container_ids:
+        containers: list = [container for container in map(Container.get_by_id, sorted(set(container_ids))) if container]
+    else:
+        containers: list = Container.get_all()
+    containers.sort(key=lambda container: (-container.placement_state().used_volume, container.id))
+    packages: dict = {package_id: Package.get_by_id(package_id) for container in containers for package_id in container.packages}
+    result: dict = {
+        "containers": len(containers),
+        "packages": len(packages),
+        "moved_packages": 0,
+        "freed_containers": [],
+        "reclaimed_volume": 0
+    }
+    missing: list = [package_id for package_id, package in packages.items() if package is None]
+    if missing:
+        result.update({"outcome": "unchanged", "message": f"Containers list packages without records: {missing[:10]}"})
+        return finish(result, started)
+
+    states: list = [container.new_placement_state() for container in containers]
+    placements: dict = first_fit_decreasing(
+        states, [(package.id, package.get_orientations(), package.weight) for package in packages.values()],
+        started + time_limit
+    )
+    if len(placements) < len(packages):
+        timed_out: bool = time.perf_counter() - started > time_limit
+        result.update({
+            "outcome": "timeout" if timed_out else "unchanged",
+            "message": "Repacking did not finish in time" if timed_out else "Not every package fitted when packed again"
+        })
+        return finish(result, started)
+
+    reclaimed: int = sum(headroom(state) for state in states) - \
+        sum(headroom(container.placement_state()) for container in containers)
+    if reclaimed <= 0:
+        result.update({"outcome": "unchanged", "message": "Repacking would not free any room"})
+        return finish(result, started)
+
+    moved: list = []
+    previous: dict = {}
+    for package in packages.values():
+        index, position, orientation_index = placements[package.id]
+        container_id: str = containers[index].id
+        rotation_code: int = package.get_rotation_items()[orientation_index]
+        if (package.container_id, package.position, package.rotation_orientation) != (container_id, tuple(position), rotation_code):
+            previous[package.id] = package.publish_data()
+            package.container_id, package.position, package.rotation_orientation = container_id, tuple(position), rotation_code
+            moved.append(package)
+    freed: list = [container.id for container, state in zip(containers, states) if container.packages and not len(state)]
+
+    with ExitStack() as stack:
+        for container in sorted(containers, key=lambda container: container.id):
+            stack.enter_context(Container.lock(container.id))
+        # Packages are saved first, and only if each still exists, so one deleted meanwhile is
+        # not written back; containers changed since they were read then undo the package moves
+        try:
+            Package.save_all(moved, existing=True)
+        except ConflictError:
+            metrics.PLACEMENT_CONFLICTS.inc()
+            result.update({"outcome": "conflict", "message": "Packages were deleted while they were being repacked"})
+            return finish(result, started)
+        for container, state in zip(containers, states):
+            container.packages = list(state.grid.boxes)
+            container.use_placement_state(state)
+        try:
+            Container.save_all(containers)
+        except ConflictError:
+            metrics.PLACEMENT_CONFLICTS.inc()
+            restore_packages(previous)
+            result.update({"outcome": "conflict", "message": "Containers were changed while they were being repacked"})
+            return finish(result, started)
+
+    result.update({
+        "outcome": "repacked",
+        "moved_packages": len(moved),
+        "freed_containers": sorted(freed),
+        "reclaimed_volume": reclaimed
+    })
+    return finish(result, started)
+
+
+def finish(result: dict, started: float) -> dict:
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def restore_packages(records: dict):
+    """
+    Writes back the records packages had before a repack moved them, leaving out any deleted
+    since, which are then the only ones left as they were.
+    """
+    try:
+        Package.store.put_many(records, {id: 0 for id in records})
+    except ConflictError:
+        for id, record in records.items():
+            try:
+                Package.store.put_many({id: record}, {id: 0})
+            except ConflictError:
+                pass
+
+
+def run_job(job: RepackJob):
+    try:
+        job.result = repack(job.container_ids, job.time_limit)
+        job.state = "finished"
+    except Exception as error:
+        job.result = {"message": f"{type(error).__name__}: {error}"}
+        job.state = "failed"
+    try:
+        job.save(existing=True)
+    except ConflictError:
+        # Dropped meanwhile, once REPACK_JOBS_KEPT newer jobs were started
+        pass
+
+
+def start_job(container_ids: list, time_limit: float, kept: int) -> RepackJob:
+    job: RepackJob = RepackJob(container_ids=container_ids, time_limit=time_limit)
+    job.save()
+    RepackJob.prune(kept)
+    threading.Thread(target=run_job, args=(job,), daemon=True).start()
+    return job
+
+
+class RepackResource(Resource):
+    @use_kwargs(
+        {
+            "container_ids": List(Str(), required=False, location="json"),
+            "time_limit": Float(required=False, location="json", validate=Range(min=0, min_inclusive=False))
+        }
+    )
+    def post(self, container_ids: list=None, time_limit: float=None):
+        """
+        Starts a repack job
+        Packs the packages of the given containers (or of the whole fleet) again in the background, fullest containers first, to consolidate them and free whole containers. The new layout is only saved if it frees room, and the job gives up after its time limit
+        ---
+        parameters:
+          - in: body
+            name: container_ids
+            type: array
+            required: false
+            items:
+              type: string
+            example: [A1, A2]
+            description: Containers to repack together, the whole fleet when omitted
+          - in: body
+            name: time_limit
+            type: number
+            required: false
+            example: 5
+            description: Seconds the job may spend packing, capped at the REPACK_TIME_LIMIT setting
+        responses:
+          202:
+            description: The job was started; poll /containers/repack/<job id> for its result
+        """
+        limit: float = current_app.config["REPACK_TIME_LIMIT"]
+        time_limit = min(time_limit, limit) if time_limit else limit
+        job: RepackJob = start_job(container_ids, time_limit, current_app.config["REPACK_JOBS_KEPT"])
+        return {"job": job.data()}, HTTPStatus.ACCEPTED
+
+
+class RepackJobResource(Resource):
+    def get(self, job_id: str):
+        """
+        Result of a repack job
+        Returns whether the job is still running and, once it is done, its outcome: repacked, unchanged, timeout or conflict, the packages it moved, the containers it freed and the volume it reclaimed
+        ---
+        parameters:
+          - in: path
+            name: job_id
+            type: string
+            required: true
+        responses:
+          200:
+            description: State and result of the job
+          404:
+            description: No job with that ID was started, or it was dropped once REPACK_JOBS_KEPT newer ones were
+        """
+        job: RepackJob = RepackJob.get_by_id(job_id)
+        if job is None:
+            return {"message": f"Repack job not found with ID {job_id}"}, HTTPStatus.NOT_FOUND
+        return {"job": job.data()}, HTTPStatus.OK
@@ -0,0 +1,154 @@
+import bisect
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request
+
+
+# Requests carrying this header get a per-operation timing breakdown back in Server-Timing
+PROFILE_HEADER = "X-Profile"
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Counter():
+    def __init__(self, name: str, help: str):
+        self.name: str = name
+        self.help: str = help
+        self.values: dict = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1, **labels):
+        key: tuple = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines: list = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram():
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name: str = name
+        self.help: str = help
+        self.buckets: tuple = buckets
+        # Labels -> [per-bucket counts with a final +Inf bucket, sum, count]
+        self.series: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key: tuple = tuple(sorted(labels.items()))
+        with self._lock:
+            series: list = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines: list = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self.series.items()):
+                cumulative: int = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+REGISTRY: list = []
+
+
+def counter(name: str, help: str) -> Counter:
+    metric: Counter = Counter(name, help)
+    REGISTRY.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+    metric: Histogram = Histogram(name, help, buckets)
+    REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+REQUEST_SECONDS = histogram("load_manager_request_seconds", "Time spent handling HTTP requests")
+OPERATION_SECONDS = histogram("load_manager_operation_seconds", "Time spent in instrumented placement and storage operations")
+ROTATIONS_TRIED = counter("load_manager_rotations_tried_total", "Package orientations searched for a placement")
+CONTAINERS_SCANNED = counter("load_manager_containers_scanned_total", "Containers searched for room for a package")
+COLLISION_CHECKS = counter("load_manager_collision_checks_total", "Placed boxes checked for overlap with a candidate placement")
+PLACEMENT_CONFLICTS = counter("load_manager_placement_conflicts_total", "Placements dropped because the container was saved concurrently")
+
+
+def record(operation: str, seconds: float):
+    OPERATION_SECONDS.observe(seconds, operation=operation)
+    if has_request_context():
+        profile: dict = g.get("profile")
+        if profile is not None:
+            calls, total = profile.get(operation, (0, 0.0))
+            profile[operation] = (calls + 1, total + seconds)
+
+
+def timed(operation: str):
+    """
+    Decorator recording every call's duration under the given operation name, both in the
+    process-wide histogram and in the current request's profile when one was asked for.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started: float = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(operation, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def server_timing(profile: dict, elapsed: float) -> str:
+    entries: list = [
+        f'{operation};dur={total * 1000:.3f};desc="calls: {calls}"'
+        for operation, (calls, total) in sorted(profile.items(), key=lambda item: -item[1][1])
+    ]
+    return ", ".join(entries + [f"total;dur={elapsed * 1000:.3f}"])
+
+
+def init_app(app):
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if request.headers.get(PROFILE_HEADER):
+            g.profile = {}
+
+    @app.after_request
+    def record_request(response):
+        started: float = g.get("request_started")
+        if started is None:
+            return response
+        elapsed: float = time.perf_counter() - started
+        REQUEST_SECONDS.observe(
+            elapsed, endpoint=request.endpoint or "unmatched", method=request.method, status=response.status_code
+        )
+        profile: dict = g.get("profile")
+        if profile is not None:
+            response.headers["Server-Timing"] = server_timing(profile, elapsed)
+        return response
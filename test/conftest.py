@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "load_manager"))
+
+from api.app import create_app
+from api.config import TestingConfig
+from api.model.container import Container
+from api.model.package import Package
+from api.model.repack_job import RepackJob
+
+
+def configure(backend: str, directory: str, setattr=setattr):
+    """
+    Points the models and the testing config at fresh data files in `directory`.
+    """
+    models: tuple = (
+        (Container, "CONTAINER_JSON", "container.json"), (Package, "PACKAGE_JSON", "package.json"),
+        (RepackJob, "REPACK_JOB_JSON", "repack_job.json")
+    )
+    for model, attribute, name in models:
+        path: str = os.path.join(directory, name)
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                f.write("{}")
+        setattr(model, attribute, path)
+    setattr(TestingConfig, "STORAGE_BACKEND", backend)
+    setattr(TestingConfig, "SQLITE_PATH", os.path.join(directory, "load_manager.db"))
+    setattr(TestingConfig, "DOCS", "off")
+    Container.placement_states.clear()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    configure("json", str(tmp_path), monkeypatch.setattr)
+    return create_app("testing").test_client()
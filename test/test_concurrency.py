@@ -0,0 +1,81 @@
+import multiprocessing
+import threading
+from http import HTTPStatus
+
+import pytest
+
+from api.app import create_app
+from api.model.container import Container
+from api.model.package import Package
+from placement.kernel import collisions
+
+from conftest import configure
+
+
+THREADS = 6
+PROCESSES = 3
+PACKAGES_PER_WORKER = 15
+
+
+def create_packages(worker: str, client) -> list:
+    # Every worker also races the others to create the one package with a shared id
+    statuses: list = []
+    for index in range(PACKAGES_PER_WORKER):
+        id: str = f"{worker}-{index}"
+        response = client.post("/new_package/", json={"id": id, "length": 1 + index % 3, "width": 2, "depth": 1 + index % 2})
+        statuses.append((id, response.status_code))
+    statuses.append(("shared", client.post("/new_package/", json={"id": "shared", "length": 1, "width": 1, "depth": 1}).status_code))
+    return statuses
+
+
+def process_worker(backend: str, directory: str, worker: str) -> list:
+    configure(backend, directory)
+    return create_packages(worker, create_app("testing").test_client())
+
+
+@pytest.mark.parametrize("backend", ["json", "log", "snapshot", "sqlite"])
+def test_concurrent_creates(tmp_path, monkeypatch, backend):
+    directory: str = str(tmp_path)
+    configure(backend, directory, monkeypatch.setattr)
+    app = create_app("testing")
+    client = app.test_client()
+    for index in range(3):
+        assert client.post("/new_container/", json={"id": f"C{index}", "length": 12, "width": 10, "depth": 6}).status_code == HTTPStatus.CREATED
+
+    statuses: list = []
+    lock = threading.Lock()
+
+    def thread_worker(worker: str):
+        results: list = create_packages(worker, app.test_client())
+        with lock:
+            statuses.extend(results)
+
+    threads: list = [threading.Thread(target=thread_worker, args=(f"T{index}",)) for index in range(THREADS)]
+    with multiprocessing.get_context("spawn").Pool(PROCESSES) as pool:
+        processes = pool.starmap_async(process_worker, [(backend, directory, f"P{index}") for index in range(PROCESSES)])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for results in processes.get(timeout=300):
+            statuses.extend(results)
+
+    created: set = {id for id, status in statuses if status == HTTPStatus.CREATED}
+    assert [id for id, status in statuses if id != "shared" and status != HTTPStatus.CREATED] == []
+    assert sum(1 for id, status in statuses if id == "shared" and status == HTTPStatus.CREATED) == 1
+
+    for model in (Container, Package):
+        model.store.reload()
+    Container.placement_states.clear()
+    containers: list = Container.get_all()
+    listed: list = [package_id for container in containers for package_id in container.packages]
+    # No package listed twice, none lost, and each where its own record says it is
+    assert len(listed) == len(set(listed))
+    assert set(listed) == created
+    assert {package.id for package in Package.get_all()} == created
+    for container in containers:
+        for package_id in container.packages:
+            assert Package.get_by_id(package_id).container_id == container.id
+        positions, dimensions = container.placement_state().boxes.view()
+        for row in range(len(positions)):
+            assert not collisions(positions[row + 1:], dimensions[row + 1:], positions[row], dimensions[row]).any()
@@ -0,0 +1,181 @@
+import time
+from http import HTTPStatus
+
+import pytest
+
+from api.app import create_app
+from api.config import TestingConfig
+from api.model.container import Container
+from api.model.package import Package
+from placement.state import ContainerState
+from resources import repack
+
+from conftest import configure
+
+
+def test_batch_import_reports_each_item(client):
+    fleet: list = [
+        {"id": "A1", "width": 10, "length": 10, "depth": 10, "active": True},
+        {"id": "A2", "width": 0, "length": 10, "depth": 10},
+        {"id": "A3", "width": 5, "length": 5, "depth": 5, "active": False},
+        {"id": "A3", "width": 5, "length": 5, "depth": 5},
+    ]
+    response = client.post("/containers/batch/", json={"containers": fleet})
+    assert response.status_code == HTTPStatus.CREATED
+    assert [result["status"] for result in response.json["results"]] == ["created", "invalid", "created", "repeated"]
+    assert client.get("/containers/stats/A1").status_code == HTTPStatus.OK
+    assert "active" not in Container.store.get("A3")
+
+
+def test_create_validates_like_the_batch_import(client):
+    for fields in ({"width": 0}, {"length": -3}, {"max_payload": -1}):
+        container: dict = {"id": "C1", "width": 10, "length": 10, "depth": 10, **fields}
+        assert client.post("/new_container/", json=container).status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        result: dict = client.post("/containers/batch/", json={"containers": [container]}).json["results"][0]
+        assert result["status"] == "invalid"
+    assert "C1" not in Container.store
+
+
+def test_cached_state_follows_saves_by_other_processes(client):
+    client.post("/new_container/", json={"id": "C1", "width": 10, "length": 10, "depth": 10})
+    for id in ("a", "b"):
+        assert client.post("/new_package/", json={"id": id, "width": 5, "length": 5, "depth": 5}).status_code == HTTPStatus.CREATED
+    state = Container.get_by_id("C1").placement_state()
+
+    # Another process appends a package: the cached state is caught up, not rebuilt
+    record: dict = Container.store.get("C1")
+    record["packages"].append("c")
+    record["placements"].append([0, 0, 5, 5, 5, 5])
+    record["weights"].append(0.0)
+    record["version"] += 1
+    Container.store.put("C1", record)
+    assert Container.get_by_id("C1").placement_state() is state
+    assert list(state.grid.boxes) == ["a", "b", "c"]
+
+    # Another process removes one and appends another: the packages were rewritten
+    record["packages"], record["placements"], record["weights"] = ["a", "c", "d"], \
+        [record["placements"][0], record["placements"][2], [5, 5, 0, 5, 5, 5]], [0.0] * 3
+    record["version"] += 1
+    record["layout"] = record["version"]
+    Container.store.put("C1", record)
+    rebuilt = Container.get_by_id("C1").placement_state()
+    assert rebuilt is not state and list(rebuilt.grid.boxes) == ["a", "c", "d"]
+
+    # Removing through the API starts a new layout as well
+    assert client.delete("/packages/a").status_code == HTTPStatus.OK
+    assert Container.store.get("C1")["layout"] == Container.store.get("C1")["version"]
+    assert list(Container.get_by_id("C1").placement_state().grid.boxes) == ["c", "d"]
+
+
+@pytest.mark.parametrize("backend", ["json", "log", "snapshot", "sqlite"])
+def test_placement_state_is_restored_from_the_record(tmp_path, monkeypatch, backend):
+    configure(backend, str(tmp_path), monkeypatch.setattr)
+    client = create_app("testing").test_client()
+    client.post("/new_container/", json={"id": "C1", "width": 10, "length": 10, "depth": 10})
+    for index in range(6):
+        client.post("/new_package/", json={"id": f"P{index}", "width": 3, "length": 4, "depth": 5})
+    assert client.delete("/packages/P2").status_code == HTTPStatus.OK
+    points: list = Container.get_by_id("C1").placement_state().point_rows()
+
+    def add(*args, **kwargs):
+        raise AssertionError("the state was rebuilt box by box")
+
+    Container.placement_states.clear()
+    monkeypatch.setattr(ContainerState, "add", add)
+    state = Container.get_by_id("C1").placement_state()
+    assert list(state.grid.boxes) == ["P0", "P1", "P3", "P4", "P5"]
+    assert state.point_rows() == points
+
+
+@pytest.mark.parametrize("backend", ["json", "log", "snapshot", "sqlite"])
+def test_fleet_stats_match_the_containers(tmp_path, monkeypatch, backend):
+    configure(backend, str(tmp_path), monkeypatch.setattr)
+    client = create_app("testing").test_client()
+    for id in ("C1", "C2", "C3"):
+        client.post("/new_container/", json={"id": id, "width": 10, "length": 10, "depth": 10, "max_payload": 100})
+    for index in range(12):
+        client.post("/new_package/", json={"id": f"P{index}", "width": 4, "length": 5, "depth": 3, "weight": 2.5})
+    fleet: dict = client.get("/containers/stats?containers=true").json
+    containers: list = [client.get(f"/containers/stats/{id}").json for id in ("C1", "C2", "C3")]
+    assert fleet["containers"] == containers
+    assert fleet["package_count"] == sum(item["package_count"] for item in containers) == 12
+    assert fleet["payload"] == 30.0
+    assert containers[2]["free_box_bound"] == [10, 10, 10]
+    largest: dict = next(item for item in containers if item["id"] == fleet["free_box_bound_container"])
+    assert fleet["free_box_bound"] == largest["free_box_bound"] == [10, 10, 10]
+
+
+def test_fleet_stats_read_legacy_records_in_full(client):
+    client.post("/new_container/", json={"id": "C1", "width": 10, "length": 10, "depth": 10})
+    client.post("/new_package/", json={"id": "P1", "width": 10, "length": 10, "depth": 4})
+    record: dict = Container.store.get("C1")
+    record["largest_free_box"] = record.pop("free_box_bound")
+    del record["package_count"]
+    Container.store.put("C1", record)
+    Container.placement_states.clear()
+    stats: dict = client.get("/containers/stats?containers=true").json["containers"][0]
+    assert stats["package_count"] == 1 and stats["used_volume"] == 400
+    assert stats["free_box_bound"] == [10, 10, 6]
+
+
+def load_two_containers(client):
+    # Repacking moves P2 next to P1, freeing C2
+    for index in (1, 2):
+        client.post("/new_container/", json={"id": f"C{index}", "width": 10, "length": 10, "depth": 10})
+        client.post("/new_package/", json={"id": f"P{index}", "width": 5, "length": 5, "depth": 5, "container_id": f"C{index}"})
+
+
+def test_repack_does_not_write_back_deleted_packages(client, monkeypatch):
+    load_two_containers(client)
+    packer = repack.first_fit_decreasing
+
+    def delete_while_packing(*args):
+        # Another process deletes P2 while the repack is packing
+        Package.store.delete_many(["P2"])
+        return packer(*args)
+
+    monkeypatch.setattr(repack, "first_fit_decreasing", delete_while_packing)
+    with client.application.app_context():
+        result: dict = repack.repack(None, 5)
+    assert result["outcome"] == "conflict"
+    assert "P2" not in Package.store
+    assert Container.store.get("C2")["packages"] == ["P2"]
+
+
+def test_repack_conflict_leaves_packages_as_they_were(client, monkeypatch):
+    load_two_containers(client)
+    packer = repack.first_fit_decreasing
+
+    def change_while_packing(*args):
+        # Another process saves C2 while the repack is packing
+        record: dict = Container.store.get("C2")
+        record["version"] += 1
+        Container.store.put("C2", record)
+        return packer(*args)
+
+    monkeypatch.setattr(repack, "first_fit_decreasing", change_while_packing)
+    with client.application.app_context():
+        result: dict = repack.repack(None, 5)
+    assert result["outcome"] == "conflict"
+    assert Package.get_by_id("P2").container_id == "C2"
+    assert Container.store.get("C2")["packages"] == ["P2"]
+
+
+@pytest.mark.parametrize("backend", ["json", "log", "snapshot", "sqlite"])
+def test_repack_jobs_are_polled_through_any_worker(tmp_path, monkeypatch, backend):
+    configure(backend, str(tmp_path), monkeypatch.setattr)
+    monkeypatch.setattr(TestingConfig, "REPACK_JOBS_KEPT", 1)
+    client = create_app("testing").test_client()
+    load_two_containers(client)
+    first: str = client.post("/containers/repack/", json={"time_limit": 5}).json["job"]["id"]
+    job_id: str = client.post("/containers/repack/", json={"time_limit": 5}).json["job"]["id"]
+
+    # A second app stands in for another worker process, with stores of its own
+    other = create_app("testing").test_client()
+    deadline: float = time.monotonic() + 10
+    job: dict = other.get(f"/containers/repack/{job_id}").json["job"]
+    while job["state"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = other.get(f"/containers/repack/{job_id}").json["job"]
+    assert job["state"] == "finished"
+    assert other.get(f"/containers/repack/{first}").status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,89 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from api.app import create_app
+from api.config import TestingConfig
+
+from conftest import configure
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def client(request, tmp_path, monkeypatch):
+    configure(request.param, str(tmp_path), monkeypatch.setattr)
+    monkeypatch.setattr(TestingConfig, "LIST_PAGE_SIZE", 2)
+    client = create_app("testing").test_client()
+    for id in ("C1", "C2", "C3", "C4", "C5"):
+        client.post("/new_container/", json={"id": id, "length": 10, "width": 10, "depth": 10})
+    return client
+
+
+def ids(response) -> list:
+    return [item["id"] for item in response.json["data"]]
+
+
+def test_pages_follow_the_cursor_to_the_last_record(client):
+    response = client.get("/containers/?limit=2")
+    assert ids(response) == ["C1", "C2"] and response.json["next_cursor"] == "C2"
+    response = client.get("/containers/?limit=2&cursor=C2")
+    assert ids(response) == ["C3", "C4"] and response.json["next_cursor"] == "C4"
+    response = client.get("/containers/?limit=2&cursor=C4")
+    assert ids(response) == ["C5"] and response.json["next_cursor"] is None
+
+
+def test_a_page_ending_on_the_last_record_leads_to_an_empty_one(client):
+    response = client.get("/containers/?limit=5")
+    assert len(ids(response)) == 5 and response.json["next_cursor"] == "C5"
+    response = client.get("/containers/?limit=5&cursor=C5")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json == {"data": [], "next_cursor": None}
+
+
+def test_without_a_limit_every_record_is_on_one_page(client):
+    response = client.get("/containers/")
+    assert ids(response) == ["C1", "C2", "C3", "C4", "C5"] and response.json["next_cursor"] is None
+
+
+def test_a_cursor_that_is_no_id_starts_after_where_it_would_sort(client):
+    assert ids(client.get("/containers/?limit=2&cursor=C25")) == ["C3", "C4"]
+    assert ids(client.get("/containers/?cursor=A")) == ["C1", "C2", "C3", "C4", "C5"]
+    assert ids(client.get("/containers/?cursor=D")) == []
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-1", "limit=two", "format=xml"])
+def test_invalid_list_arguments_are_rejected(client, query):
+    assert client.get(f"/containers/?{query}").status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_unknown_fields_are_left_out_of_the_projection(client):
+    response = client.get("/containers/?limit=1&fields=id, length ,nope")
+    assert response.json["data"] == [{"id": "C1", "length": 10}]
+    assert client.get("/containers/?limit=1&fields=nope").json["data"] == [{}]
+
+
+def test_ndjson_streams_every_record_page_by_page(client):
+    response = client.get("/containers/?format=ndjson&fields=id")
+    assert response.status_code == HTTPStatus.OK
+    assert response.mimetype == "application/x-ndjson"
+    assert response.data.decode().endswith("\n")
+    lines: list = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert lines == [{"id": id} for id in ("C1", "C2", "C3", "C4", "C5")]
+
+
+def test_ndjson_stops_at_the_limit_after_the_cursor(client):
+    response = client.get("/containers/?format=ndjson&fields=id&cursor=C1&limit=3")
+    assert [json.loads(line) for line in response.data.decode().splitlines()] == [{"id": "C2"}, {"id": "C3"}, {"id": "C4"}]
+
+
+def test_packages_are_filtered_by_container(client):
+    for id, container_id in (("P1", "C2"), ("P2", "C1"), ("P3", "C2"), ("P4", "C2")):
+        client.post("/new_package/", json={"id": id, "length": 1, "width": 1, "depth": 1, "container_id": container_id})
+    assert ids(client.get("/packages/?container_id=C2")) == ["P1", "P3", "P4"]
+    response = client.get("/packages/?container_id=C2&limit=2&cursor=P1")
+    assert ids(response) == ["P3", "P4"] and response.json["next_cursor"] == "P4"
+    response = client.get("/packages/?container_id=C2&format=ndjson&fields=id,container_id")
+    assert [json.loads(line) for line in response.data.decode().splitlines()] == [
+        {"id": id, "container_id": "C2"} for id in ("P1", "P3", "P4")
+    ]
+    assert client.get("/packages/?container_id=C3").status_code == HTTPStatus.BAD_REQUEST
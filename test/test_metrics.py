@@ -0,0 +1,60 @@
+from http import HTTPStatus
+
+from utils import metrics
+
+
+def scrape(client) -> dict:
+    """
+    Samples of the /metrics page keyed by metric name and labels, as written before the value.
+    """
+    response = client.get("/metrics")
+    assert response.status_code == HTTPStatus.OK
+    assert response.mimetype == "text/plain"
+    samples: dict = {}
+    for line in response.data.decode().splitlines():
+        if line and not line.startswith("#"):
+            sample, value = line.rsplit(" ", 1)
+            samples[sample] = float(value)
+    return samples
+
+
+def test_metrics_count_the_placement_work_of_a_request(client):
+    client.post("/new_container/", json={"id": "C1", "length": 10, "width": 10, "depth": 10})
+    client.post("/new_package/", json={"id": "P1", "length": 4, "width": 4, "depth": 4})
+    before: dict = scrape(client)
+    response = client.post("/new_package/", json={"id": "P2", "length": 1, "width": 2, "depth": 3})
+    assert response.status_code == HTTPStatus.CREATED
+    after: dict = scrape(client)
+    grown = lambda sample: after[sample] - before.get(sample, 0)
+
+    # The six distinct orientations of P2, searched in the one container next to P1
+    assert grown("load_manager_rotations_tried_total") == 6
+    assert grown("load_manager_containers_scanned_total") == 1
+    assert grown("load_manager_collision_checks_total") > 0
+    requests: str = 'load_manager_request_seconds_count{endpoint="create_package",method="POST",status="201"}'
+    assert grown(requests) == 1
+    assert grown('load_manager_request_seconds_bucket{endpoint="create_package",method="POST",status="201",le="+Inf"}') == 1
+    operations: str = 'load_manager_operation_seconds_count{{operation="{}"}}'
+    assert grown(operations.format("load_package_to_container")) == 1
+    assert grown(operations.format("find_placement")) == 1
+    assert grown(operations.format("package.save_all")) == 1
+
+
+def test_profile_header_returns_the_timing_breakdown(client):
+    client.post("/new_container/", json={"id": "C1", "length": 10, "width": 10, "depth": 10})
+    response = client.post("/new_package/", json={"id": "P1", "length": 1, "width": 2, "depth": 3})
+    assert "Server-Timing" not in response.headers
+
+    response = client.post(
+        "/new_package/", json={"id": "P2", "length": 1, "width": 2, "depth": 3}, headers={metrics.PROFILE_HEADER: "1"}
+    )
+    assert response.status_code == HTTPStatus.CREATED
+    entries: dict = {}
+    for entry in response.headers["Server-Timing"].split(", "):
+        name, duration, *description = entry.split(";")
+        assert duration.startswith("dur=") and float(duration[len("dur="):]) >= 0
+        entries[name] = description
+    assert entries["load_package_to_container"] == ['desc="calls: 1"']
+    assert entries["find_placement"] == ['desc="calls: 1"']
+    assert entries["package.save_all"] == ['desc="calls: 1"']
+    assert entries["total"] == []
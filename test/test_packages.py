@@ -0,0 +1,167 @@
+from http import HTTPStatus
+
+import numpy as np
+import pytest
+
+from api.app import create_app
+from api.config import TestingConfig
+from api.model.box_rotation_type import BoxRotationType, RotationConstraint, distinct_rotations
+from api.model.container import Container
+from api.model.package import Package
+from placement import parallel
+from placement.kernel import collisions
+from placement.state import ContainerState
+from resources import package
+
+from conftest import configure
+
+
+@pytest.mark.parametrize("backend", ["json", "log", "snapshot", "sqlite"])
+def test_get_package_by_numeric_id(tmp_path, monkeypatch, backend):
+    configure(backend, str(tmp_path), monkeypatch.setattr)
+    client = create_app("testing").test_client()
+    assert client.post("/new_container/", json={"id": "C1", "length": 10, "width": 10, "depth": 10}).status_code == HTTPStatus.CREATED
+    assert client.post("/new_package/", json={"id": "7", "length": 1, "width": 1, "depth": 1}).status_code == HTTPStatus.CREATED
+    assert client.get("/get_package/7").status_code == HTTPStatus.OK
+    assert client.get("/get_package/1").status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_create_only_reads_containers_that_may_fit(tmp_path, monkeypatch, backend):
+    configure(backend, str(tmp_path), monkeypatch.setattr)
+    client = create_app("testing").test_client()
+    client.post("/new_container/", json={"id": "small", "length": 2, "width": 2, "depth": 2})
+    client.post("/new_container/", json={"id": "light", "length": 10, "width": 10, "depth": 10, "max_payload": 1})
+    client.post("/new_container/", json={"id": "full", "length": 5, "width": 5, "depth": 5})
+    client.post("/new_container/", json={"id": "roomy", "length": 10, "width": 10, "depth": 10})
+    client.post("/new_package/", json={"id": "P1", "length": 5, "width": 5, "depth": 5, "container_id": "full"})
+    Container.placement_states.clear()
+    read: list = []
+    get_by_id = Container.get_by_id.__func__
+    monkeypatch.setattr(Container, "get_by_id", classmethod(lambda cls, id: read.append(id) or get_by_id(cls, id)))
+
+    response = client.post("/new_package/", json={"id": "P2", "length": 3, "width": 3, "depth": 3, "weight": 2})
+    assert response.status_code == HTTPStatus.CREATED
+    assert set(read) == {"roomy"}
+    assert set(Container.placement_states) == {"roomy"}
+
+
+def test_parallel_search_snapshots_states_under_their_lock(tmp_path, monkeypatch):
+    configure("json", str(tmp_path), monkeypatch.setattr)
+    monkeypatch.setattr(TestingConfig, "PLACEMENT_WORKERS", 2)
+    monkeypatch.setattr(TestingConfig, "PLACEMENT_PARALLEL_MIN_BOXES", 0)
+    client = create_app("testing").test_client()
+    for id in ("C1", "C2"):
+        client.post("/new_container/", json={"id": id, "length": 10, "width": 10, "depth": 10})
+    locked: list = []
+    snapshot = ContainerState.snapshot
+
+    def locked_snapshot(state):
+        locked.append(any(lock._is_owned() for lock in Container.locks.values()))
+        return snapshot(state)
+
+    monkeypatch.setattr(ContainerState, "snapshot", locked_snapshot)
+    try:
+        response = client.post("/new_package/", json={"id": "P1", "length": 2, "width": 2, "depth": 2})
+    finally:
+        parallel.shutdown_pool()
+    assert response.status_code == HTTPStatus.CREATED
+    assert locked == [True, True]
+
+
+def test_batch_loads_a_manifest(client):
+    client.post("/new_container/", json={"id": "C1", "length": 10, "width": 10, "depth": 10})
+    client.post("/new_container/", json={"id": "C2", "length": 4, "width": 4, "depth": 4})
+    client.post("/new_package/", json={"id": "old", "length": 1, "width": 1, "depth": 1, "container_id": "C1"})
+    manifest: list = [{"id": f"P{index}", "length": 5, "width": 5, "depth": 4, "weight": 1.5} for index in range(6)] + [
+        {"id": "pinned", "length": 4, "width": 4, "depth": 4, "container_id": "C2"},
+        {"id": "P0", "length": 1, "width": 1, "depth": 1},
+        {"id": "old", "length": 1, "width": 1, "depth": 1},
+        {"id": "lost", "length": 1, "width": 1, "depth": 1, "container_id": "C9"},
+        {"id": "huge", "length": 20, "width": 20, "depth": 20},
+    ]
+    response = client.post("/packages/batch/", json={"packages": manifest})
+    assert response.status_code == HTTPStatus.CREATED
+    placed: dict = {item["id"]: item for item in response.json["placed"]}
+    unplaced: dict = {item["id"]: item["message"] for item in response.json["unplaced"]}
+    assert set(placed) == {"P0", "P1", "P2", "P3", "P4", "P5", "pinned"}
+    assert set(unplaced) == {"P0", "old", "lost", "huge"}
+    assert placed["pinned"]["container_id"] == "C2"
+    assert Container.store.get("C2")["packages"] == ["pinned"]
+
+    boxes: list = Container.store.get("C1")["placements"]
+    assert sorted(Container.store.get("C1")["packages"]) == ["P0", "P1", "P2", "P3", "P4", "P5", "old"]
+    positions, dimensions = np.array(boxes)[:, :3], np.array(boxes)[:, 3:]
+    for row in range(len(boxes)):
+        assert collisions(positions, dimensions, positions[row], dimensions[row]).sum() == 1
+    assert Package.get_by_id("P3").container_id == "C1"
+
+
+def test_batch_rejects_boxes_without_volume(client):
+    client.post("/new_container/", json={"id": "C1", "length": 10, "width": 10, "depth": 10})
+    for width in (0, -2):
+        response = client.post("/packages/batch/", json={"packages": [{"id": "P1", "length": 1, "width": width, "depth": 1}]})
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert "P1" not in Package.store
+
+
+def test_batch_only_packs_into_the_containers_it_locked(client, monkeypatch):
+    client.post("/new_container/", json={"id": "C1", "length": 2, "width": 2, "depth": 2})
+    pack_manifest = package.pack_manifest
+
+    def create_meanwhile(items: list, container_ids: list) -> tuple:
+        Container("C2", 10, 10, 10).save()
+        return pack_manifest(items, container_ids)
+
+    monkeypatch.setattr(package, "pack_manifest", create_meanwhile)
+    manifest: list = [{"id": "small", "length": 2, "width": 2, "depth": 2}, {"id": "big", "length": 5, "width": 5, "depth": 5}]
+    response = client.post("/packages/batch/", json={"packages": manifest})
+    assert response.status_code == HTTPStatus.CREATED
+    assert [item["id"] for item in response.json["unplaced"]] == ["big"]
+    assert Container.store.get("C2")["packages"] == []
+
+
+@pytest.mark.parametrize("dimensions, constraint, expected", [
+    ((1, 2, 3), RotationConstraint.ANY, [(1, 2, 3), (1, 3, 2), (2, 1, 3), (2, 3, 1), (3, 1, 2), (3, 2, 1)]),
+    ((2, 2, 3), RotationConstraint.ANY, [(2, 2, 3), (2, 3, 2), (3, 2, 2)]),
+    ((2, 2, 2), RotationConstraint.ANY, [(2, 2, 2)]),
+    ((1, 2, 3), RotationConstraint.THIS_SIDE_UP, [(1, 2, 3), (2, 1, 3)]),
+    ((2, 2, 3), RotationConstraint.THIS_SIDE_UP, [(2, 2, 3)]),
+    ((1, 2, 3), RotationConstraint.NONE, [(1, 2, 3)]),
+])
+def test_orientations_are_distinct_and_allowed_by_the_constraint(dimensions, constraint, expected):
+    rotations: tuple = distinct_rotations(*dimensions, constraint)
+    assert [rotated for _, rotated in rotations] == expected
+    package: Package = Package("P1", *dimensions, rotation_constraint=constraint)
+    assert package.get_orientations() == expected
+    assert package.get_rotation_items() == [code for code, _ in rotations]
+
+
+def test_upright_packages_are_not_laid_down(client):
+    client.post("/new_container/", json={"id": "C1", "length": 10, "width": 10, "depth": 3})
+    response = client.post("/new_package/", json={
+        "id": "up", "length": 1, "width": 1, "depth": 5, "rotation_constraint": RotationConstraint.THIS_SIDE_UP
+    })
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert client.post("/new_package/", json={"id": "any", "length": 1, "width": 1, "depth": 5}).status_code == HTTPStatus.CREATED
+    assert Package.get_by_id("any").rotation_orientation != BoxRotationType.WLD
+
+    response = client.post("/packages/batch/", json={"packages": [
+        {"id": "flat", "length": 5, "width": 1, "depth": 1, "rotation_constraint": RotationConstraint.NONE},
+        {"id": "tall", "length": 1, "width": 1, "depth": 5, "rotation_constraint": RotationConstraint.NONE}
+    ]})
+    assert [package["id"] for package in response.json["placed"]] == ["flat"]
+    assert response.json["placed"][0]["rotation_orientation"] == BoxRotationType.WLD
+    assert [package["id"] for package in response.json["unplaced"]] == ["tall"]
+
+
+def test_unknown_rotation_constraints_are_unprocessable(client):
+    client.post("/new_container/", json={"id": "C1", "length": 10, "width": 10, "depth": 10})
+    package: dict = {"id": "P1", "length": 1, "width": 1, "depth": 1, "rotation_constraint": "sideways"}
+    response = client.post("/new_package/", json=package)
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert "rotation_constraint" in response.json["errors"]["json"]
+    response = client.post("/packages/batch/", json={"packages": [package]})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert "rotation_constraint" in response.json["errors"]["json"]["packages"]["0"]
+    assert Package.get_by_id("P1") is None
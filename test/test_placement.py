@@ -0,0 +1,155 @@
+import random
+
+import numpy as np
+
+from api.model.box_rotation_type import RotationConstraint, distinct_rotations
+from placement import kernel, parallel
+from placement.kernel import collisions
+from placement.state import ContainerState
+from utils import metrics
+
+
+def collision_checks() -> int:
+    return metrics.COLLISION_CHECKS.values.get((), 0)
+
+
+def fill(state: ContainerState, count: int, rng: random.Random, shape: tuple = None) -> list:
+    """
+    Places random packages, or packages of the given shape, until `count` are in, returning
+    the boxes each search and insert checked for collisions.
+    """
+    checks: list = []
+    while len(state) < count:
+        orientations: list = [dimensions for _, dimensions in distinct_rotations(
+            *(shape or [rng.randint(10, 60) for _ in range(3)]), RotationConstraint.ANY
+        )]
+        before: int = collision_checks()
+        placement: tuple = state.find_placement(orientations)
+        if placement is None:
+            break
+        state.add(len(state), placement[0], orientations[placement[1]])
+        checks.append(collision_checks() - before)
+    return checks
+
+
+def test_placements_do_not_overlap():
+    state: ContainerState = ContainerState(200, 200, 200)
+    fill(state, 300, random.Random(1))
+    positions, dimensions = state.boxes.view()
+    assert np.all(positions >= 0) and np.all(positions + dimensions <= state.bounds)
+    for row in range(len(positions)):
+        assert collisions(positions, dimensions, positions[row], dimensions[row]).sum() == 1
+
+
+def test_the_thousandth_package_costs_no_more_than_the_tenth():
+    state: ContainerState = ContainerState(400, 400, 400)
+    checks: list = fill(state, 1000, random.Random(0), (30, 40, 50))
+    assert len(state) == 1000
+    assert max(checks[-10:]) <= max(checks[:10])
+    assert sum(checks[-100:]) <= sum(checks[:100])
+
+
+def test_collision_checks_only_examine_nearby_boxes(monkeypatch):
+    # Boxes examined and placements checked by the searches since the last reset
+    counts: list = [0, 0]
+
+    def counted(bounds, positions, dimensions, pivots, orientations):
+        before: int = collision_checks()
+        mask: np.ndarray = feasible_placements(bounds, positions, dimensions, pivots, orientations)
+        counts[0] += collision_checks() - before
+        counts[1] += mask.size
+        return mask
+
+    def boxes_per_placement(count: int) -> float:
+        fill(state, count - 100, rng)
+        counts[:] = [0, 0]
+        fill(state, count, rng)
+        return counts[0] / counts[1]
+
+    feasible_placements = kernel.feasible_placements
+    monkeypatch.setattr(kernel, "feasible_placements", counted)
+    state: ContainerState = ContainerState(400, 400, 400)
+    rng: random.Random = random.Random(0)
+    at_500: float = boxes_per_placement(500)
+    at_1000: float = boxes_per_placement(1000)
+    assert len(state) == 1000
+    # Once the load is packed around them, placements are checked against the same few
+    # neighbours, where checking every box would double the work along with the boxes
+    assert at_1000 < 1.5 * at_500
+    assert at_1000 < 10
+    assert len(state.extreme_points()) < 4 * len(state)
+
+
+def test_restored_state_matches_the_placed_one():
+    state: ContainerState = ContainerState(200, 200, 200)
+    fill(state, 200, random.Random(3))
+    for key in range(0, len(state), 7):
+        state.remove(key)
+    keys: list = list(state.grid.boxes)
+    boxes, weights = state.placements(keys)
+    restored: ContainerState = ContainerState(200, 200, 200)
+    restored.restore(keys, boxes, weights, state.point_rows())
+    assert restored.point_rows() == state.point_rows()
+    assert (restored.used_volume, restored.used_height, restored.free_box_bound()) == \
+        (state.used_volume, state.used_height, state.free_box_bound())
+    rng: random.Random = random.Random(4)
+    for key in range(1000, 1030):
+        dimensions: tuple = tuple(rng.randint(10, 60) for _ in range(3))
+        placement: tuple = state.find_placement([dimensions])
+        assert placement == restored.find_placement([dimensions])
+        if placement is not None:
+            state.add(key, placement[0], dimensions)
+            restored.add(key, placement[0], dimensions)
+
+
+def test_support_counts_the_box_tops_under_the_footprint():
+    state: ContainerState = ContainerState(10, 10, 10, min_support=0.5)
+    state.add("a", (0, 0, 0), (4, 10, 2))
+    state.add("b", (4, 0, 0), (6, 10, 3))
+    state.add("c", (0, 0, 2), (2, 10, 5))
+    assert state.tops.support((0, 0, 0), (5, 5, 5)) == 1.0
+    assert state.tops.support((2, 0, 2), (4, 5, 1)) == 0.5
+    assert state.tops.support((2, 0, 3), (4, 5, 1)) == 0.5
+    assert not state.supported((1, 0, 3), (4, 5, 1))
+    state.remove("b")
+    assert state.tops.support((2, 0, 3), (4, 5, 1)) == 0.0
+    assert state.used_height == 7
+    state.remove("c")
+    assert state.used_height == 2
+
+
+def test_parallel_search_applies_support_and_balance():
+    rng: random.Random = random.Random(2)
+    states: list = [ContainerState(60, 40, 40, min_support=0.75, balanced=True) for _ in range(3)]
+    for index, state in enumerate(states):
+        for key in range(40 + 20 * index):
+            dimensions: tuple = tuple(rng.randint(3, 12) for _ in range(3))
+            placement: tuple = state.find_placement([dimensions], rng.uniform(1, 20))
+            if placement is not None:
+                state.add(key, placement[0], dimensions, rng.uniform(1, 20))
+    try:
+        for _ in range(10):
+            orientations: list = [dimensions for _, dimensions in distinct_rotations(
+                *(rng.randint(3, 12) for _ in range(3)), RotationConstraint.ANY
+            )]
+            weight: float = rng.uniform(1, 20)
+            found: list = parallel.find_placements([state.snapshot() for state in states], orientations, 2, weight)
+            for state, placement in zip(states, found):
+                # A fresh search, as the workers make, without a frontier from earlier ones
+                state._frontiers.clear()
+                assert placement == state.find_placement(orientations, weight)
+    finally:
+        parallel.shutdown_pool()
+
+
+
+def test_shapes_that_did_not_fit_only_rule_out_larger_ones():
+    rotations = lambda *dimensions: [rotated for _, rotated in distinct_rotations(*dimensions, RotationConstraint.ANY)]
+    state: ContainerState = ContainerState(10, 10, 10)
+    # Out of the way of every ray from the origin, yet in the way of a cube there
+    state.add("a", (5, 5, 0), (5, 5, 10))
+    assert state.find_placement(rotations(6, 6, 6)) is None
+    assert state.find_placement(rotations(6, 7, 6)) is None
+    assert state.find_placement(rotations(4, 6, 6))[0] == (0, 0, 0)
+    state.remove("a")
+    assert state.find_placement(rotations(6, 7, 6)) == ((0, 0, 0), 0)
@@ -0,0 +1,134 @@
+import json
+import os
+import time
+
+import pytest
+
+from api.storage import ConflictError, Store, open_store
+from api.storage.snapshot_store import Snapshot, write_snapshot
+from api.storage.sqlite_store import import_json
+
+
+RECORDS = {
+    "P1": {"width": 2, "length": 3, "depth": 4, "container_id": "C1", "position": [0, 0, 0], "version": 1},
+    "P2": {"width": 1, "length": 1, "depth": 1, "container_id": None, "position": None, "version": 1},
+}
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        Store()
+
+
+@pytest.mark.parametrize("backend", ["json", "log"])
+def test_records_handed_out_are_copies(tmp_path, backend):
+    path = tmp_path / "container.json"
+    path.write_text(json.dumps({"C1": {"packages": ["a"], "placements": [[0, 0, 0, 1, 1, 1]], "version": 1}}))
+    store = open_store(backend, str(path))
+    record = store.get("C1")
+    record["version"] = 2
+    record["packages"].append("b")
+    dict(store.items())["C1"]["placements"].clear()
+    assert store.get("C1") == {"packages": ["a"], "placements": [[0, 0, 0, 1, 1, 1]], "version": 1}
+
+
+@pytest.mark.parametrize("backend", ["json", "log", "snapshot", "sqlite"])
+def test_keys_are_the_ordered_ids(tmp_path, backend):
+    path = str(tmp_path / "package.json")
+    options: dict = {"table": "packages"} if backend in ("snapshot", "sqlite") else {}
+    if backend in ("json", "log"):
+        with open(path, "w") as f:
+            f.write("{}")
+    store = open_store(backend, path, **options)
+    store.put_many({"P2": RECORDS["P2"], "P1": RECORDS["P1"], "P3": RECORDS["P2"]})
+    store.delete_many(["P3"])
+    assert store.keys() == ["P1", "P2"]
+
+
+def test_json_store_sees_writes_within_one_mtime_tick(tmp_path):
+    path = tmp_path / "container.json"
+    path.write_text("{}")
+    first, second = open_store("json", str(path)), open_store("json", str(path))
+    first.put("X", {"version": 1})
+    assert "X" in second
+    mtime = os.stat(path).st_mtime_ns
+    first.put("Y", {"version": 1})
+    # Another process's write landing within the same timestamp tick
+    os.utime(path, ns=(mtime, mtime))
+    second.put("Z", {"version": 1})
+    assert sorted(json.loads(path.read_text())) == ["X", "Y", "Z"]
+
+
+def test_sqlite_imports_json_once(tmp_path):
+    json_path, database = tmp_path / "package.json", str(tmp_path / "load_manager.db")
+    json_path.write_text(json.dumps(RECORDS))
+    import_json(str(json_path), database, "packages")
+    store = open_store("sqlite", database, table="packages")
+    assert dict(store.items()) == RECORDS
+    assert [id for id, _ in store.query(container_id="C1")] == ["P1"]
+
+    # Later starts keep the database as it is, not as the JSON file was
+    store.delete_many(["P2"])
+    with pytest.raises(ConflictError):
+        store.put_many({"P1": RECORDS["P1"]}, {"P1": 0})
+    import_json(str(json_path), database, "packages")
+    assert [id for id, _ in store.items()] == ["P1"]
+
+
+def test_snapshot_looks_up_ids_as_strings(tmp_path):
+    path = str(tmp_path / "package.snapshot")
+    write_snapshot(path, "packages", {"1": RECORDS["P1"], "P2": RECORDS["P2"]})
+    snapshot = Snapshot(path)
+    assert snapshot.index(1) == snapshot.index("1") == 0
+    assert snapshot.index(2) is None
+
+
+def open_log_store(backend: str, path: str, **options):
+    if backend == "snapshot":
+        options["table"] = "packages"
+    elif not os.path.exists(path):
+        with open(path, "w") as f:
+            f.write("{}")
+    return open_store(backend, path, fsync=False, **options)
+
+
+@pytest.mark.parametrize("backend", ["log", "snapshot"])
+def test_a_torn_last_log_line_is_dropped_and_overwritten(tmp_path, backend):
+    path = str(tmp_path / "package.json")
+    store = open_log_store(backend, path)
+    store.put("P1", RECORDS["P1"])
+    store.put("P2", RECORDS["P2"])
+    with open(store.log_path, "rb+") as f:
+        # A crash partway through appending P2
+        f.truncate(os.path.getsize(store.log_path) - 5)
+
+    reopened = open_log_store(backend, path)
+    assert reopened.keys() == ["P1"]
+    reopened.put("P3", RECORDS["P2"])
+    with open(reopened.log_path, "rb") as f:
+        lines: list = f.read().splitlines(keepends=True)
+    assert [json.loads(line)["id"] for line in lines] == ["P1", "P3"]
+    assert open_log_store(backend, path).keys() == ["P1", "P3"]
+
+
+@pytest.mark.parametrize("backend", ["log", "snapshot"])
+def test_the_log_is_compacted_into_the_snapshot_past_the_threshold(tmp_path, backend):
+    path = str(tmp_path / "package.json")
+    store = open_log_store(backend, path, compact_threshold=3)
+    store.put("P1", RECORDS["P1"])
+    store.put("P2", RECORDS["P2"])
+    assert not store._compacting and os.path.getsize(store.log_path) > 0
+    store.put("P1", {**RECORDS["P1"], "width": 5})
+    deadline: float = time.monotonic() + 10
+    while store._compacting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not store._compacting
+    assert not os.path.exists(store.log_path) and not os.path.exists(store.old_log_path)
+    # The snapshot alone now holds every record as last put
+    assert open_log_store(backend, path).get("P1")["width"] == 5
+
+    store.put("P3", RECORDS["P2"])
+    assert os.path.getsize(store.log_path) > 0
+    reopened = open_log_store(backend, path)
+    assert reopened.keys() == ["P1", "P2", "P3"]
+    assert reopened.get("P1")["width"] == 5